@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='async-db',
+)
+
+
+def run_in_db_thread(func, *args, **kwargs):
+    """Выполняет синхронный код с обращениями к БД в ограниченном пуле
+    потоков, не занимая цикл событий."""
+    def call():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False, executor=executor)()
+
+
+def render_response(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    if response.streaming:
+        # ASGI-обработчик Django 3.2 перебирает потоковый ответ прямо в
+        # цикле событий, поэтому тело собирается здесь же, в потоке.
+        streamed = response
+        response = HttpResponse(
+            b''.join(streamed.streaming_content), status=streamed.status_code
+        )
+        for header, value in streamed.items():
+            response[header] = value
+    return response
+
+
+def async_viewset_view(viewset, actions, **initkwargs):
+    """Асинхронная обёртка над действиями вьюсета для режима ASGI.
+
+    Разбор запроса, запросы к БД и рендеринг выполняются в пуле потоков
+    run_in_db_thread, цикл событий обслуживает медленных клиентов.
+    """
+    view = viewset.as_view(actions, **initkwargs)
+
+    async def async_view(request, *args, **kwargs):
+        return await run_in_db_thread(
+            render_response, view, request, *args, **kwargs
+        )
+
+    async_view.csrf_exempt = True
+    async_view.cls = viewset
+    async_view.actions = actions
+    return async_view
@@ -0,0 +1,113 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш процесса с ограничением времени жизни."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+def token_cache_settings():
+    return {
+        'LOCAL_SIZE': 10000,
+        'LOCAL_TTL': 30,
+        'SHARED_ALIAS': None,
+        'SHARED_TTL': 300,
+        **getattr(settings, 'TOKEN_AUTH_CACHE', {}),
+    }
+
+
+_settings = token_cache_settings()
+local_tokens = LRUCache(_settings['LOCAL_SIZE'], _settings['LOCAL_TTL'])
+
+
+def shared_key(key):
+    return f'auth_token:{key}'
+
+
+def get_shared_cache():
+    alias = token_cache_settings()['SHARED_ALIAS']
+    return caches[alias] if alias else None
+
+
+def invalidate_token(key):
+    """Удаляет токен из кеша процесса и общего кеша.
+
+    Кеши других процессов устаревают не позже чем через LOCAL_TTL.
+    """
+    local_tokens.delete(key)
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.delete(shared_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешированием пары токен → пользователь.
+
+    Сначала проверяется LRU-кеш процесса, затем общий кеш (если задан
+    TOKEN_AUTH_CACHE['SHARED_ALIAS']), и только потом база данных.
+    """
+
+    def authenticate_credentials(self, key):
+        token = local_tokens.get(key)
+        if token is None:
+            shared = get_shared_cache()
+            if shared is not None:
+                token = shared.get(shared_key(key))
+            if token is None:
+                model = self.get_model()
+                try:
+                    token = model.objects.select_related('user').get(key=key)
+                except model.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                if shared is not None:
+                    shared.set(
+                        shared_key(key),
+                        token,
+                        token_cache_settings()['SHARED_TTL']
+                    )
+            local_tokens.set(key, token)
+
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (token.user, token)
@@ -0,0 +1,33 @@
+import uuid
+
+from django.core.cache import cache
+
+from backend.constants import RECIPE_CACHE_TIMEOUT
+from recipes.models import Recipe
+
+
+def recipe_cache_key(recipe):
+    return f'recipe:{recipe.pk}:{recipe.cache_version}'
+
+
+def get_cached_recipes(recipes):
+    """Возвращает закешированные представления рецептов по их id.
+
+    Ключ включает версию из строки рецепта, поэтому после правки рецепта
+    в любом процессе старое представление больше не читается.
+    """
+    keys = {recipe.pk: recipe_cache_key(recipe) for recipe in recipes}
+    cached = cache.get_many(list(keys.values()))
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+
+def cache_recipe(recipe, data):
+    cache.set(recipe_cache_key(recipe), data, RECIPE_CACHE_TIMEOUT)
+
+
+def invalidate_recipes(recipe_ids):
+    """Меняет версии кеша рецептов в текущей транзакции: другие процессы
+    увидят их вместе с изменёнными данными. Возвращает новую версию."""
+    version = uuid.uuid4().hex
+    Recipe.objects.filter(pk__in=recipe_ids).update(cache_version=version)
+    return version
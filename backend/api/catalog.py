@@ -0,0 +1,91 @@
+import gzip
+import re
+import time
+import uuid
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from backend.constants import CATALOG_CACHE_TIMEOUT
+from recipes.models import CatalogVersion
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def new_version():
+    return {'etag': uuid.uuid4().hex, 'modified': int(time.time())}
+
+
+def get_catalog_version(name):
+    """Возвращает текущую версию справочника, создавая её при отсутствии.
+
+    Версия читается из базы, поэтому общая для всех процессов.
+    """
+    versions = CatalogVersion.objects.filter(name=name).values(
+        'etag', 'modified'
+    )
+    version = versions.first()
+    if version is None:
+        CatalogVersion.objects.bulk_create(
+            [CatalogVersion(name=name, **new_version())],
+            ignore_conflicts=True
+        )
+        version = versions.get()
+    return version
+
+
+def bump_catalog_version(name):
+    """Меняет версию справочника в текущей транзакции: другие процессы
+    увидят её вместе с изменёнными данными."""
+    CatalogVersion.objects.update_or_create(name=name, defaults=new_version())
+
+
+class CatalogListMixin:
+    """Отдаёт полный справочник готовым сжатым телом с ETag.
+
+    Тело ответа собирается один раз на версию справочника, повторные
+    запросы с If-None-Match/If-Modified-Since получают 304 Not Modified.
+    Запросы с параметрами фильтрации обрабатываются как обычно.
+    """
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        version = get_catalog_version(self.catalog_name)
+        etag = quote_etag(version['etag'])
+        response = get_conditional_response(
+            request, etag=etag, last_modified=version['modified']
+        )
+        if response is None:
+            body = self.get_catalog_body(version)
+            accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            if ACCEPTS_GZIP.search(accept_encoding):
+                response = HttpResponse(
+                    body['gzip'], content_type='application/json'
+                )
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(
+                    body['identity'], content_type='application/json'
+                )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version['modified'])
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def get_catalog_body(self, version):
+        key = f'catalog:{self.catalog_name}:{version["etag"]}'
+        body = cache.get(key)
+        if body is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            content = JSONRenderer().render(serializer.data)
+            body = {'identity': content, 'gzip': gzip.compress(content)}
+            cache.set(key, body, CATALOG_CACHE_TIMEOUT)
+        return body
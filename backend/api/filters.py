@@ -1,14 +1,44 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Case, IntegerField, When
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
+from backend.constants import INGREDIENT_SEARCH_LIMIT
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from recipes.tags import filter_by_tags
+
+from .search import get_ingredient_index
 
 User = get_user_model()
 
 
 class IngredientFilter(SearchFilter):
+    """Поиск ингредиентов по индексу в памяти.
+
+    Сначала идут ингредиенты, название которых начинается с запроса,
+    затем содержащие его. Размер выдачи ограничивается параметром limit.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return INGREDIENT_SEARCH_LIMIT
+        return max(1, min(limit, INGREDIENT_SEARCH_LIMIT))
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        ids = get_ingredient_index().search(query, self.get_limit(request))
+        rank = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=ids).order_by(rank)
 
 
 class RecipeFilter(FilterSet):
@@ -16,6 +46,11 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags'
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='filter_tags_mode'
     )
 
     is_in_shopping_cart = filters.BooleanFilter(
@@ -24,6 +59,10 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
     )
+    search = filters.CharFilter(method='filter_search')
+    cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
 
     class Meta:
         model = Recipe
@@ -34,10 +73,25 @@ class RecipeFilter(FilterSet):
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.is_user_anonymous():
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.is_user_anonymous():
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        match_all = self.form.cleaned_data.get('tags_mode') == 'all'
+        return filter_by_tags(queryset, value, match_all)
+
+    def filter_tags_mode(self, queryset, name, value):
         return queryset
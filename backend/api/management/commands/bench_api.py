@@ -0,0 +1,425 @@
+import io
+import itertools
+import json
+import math
+import random
+import statistics
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.catalog import bump_catalog_version
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredients, ShoppingCart, Subscribe, Tag)
+
+User = get_user_model()
+
+INGREDIENTS_FILE = (
+    Path(settings.BASE_DIR) / 'recipes/management/commands/ingredients.json'
+)
+PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhg'
+    'GAWjR9awAAAABJRU5ErkJggg=='
+)
+RECIPE_FILTERS = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+BENCH_PREFIX = 'bench'
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def bulk_create_ids(model, objs, batch_size=1000):
+    """Создаёт объекты и возвращает их id, в том числе на SQLite, где
+    bulk_create не возвращает первичные ключи."""
+    start = last_pk(model)
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    return list(
+        model.objects.filter(pk__gt=start).values_list('pk', flat=True)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными и замеряет ключевые '
+        'эндпоинты API в процессе: p50/p95, число SQL-запросов и размер '
+        'ответа. Результат пишется в JSON и может сравниваться с '
+        'предыдущим прогоном. Запускайте на отдельной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Использовать данные, созданные предыдущим запуском'
+        )
+        parser.add_argument('--only', help='Подстрока имени замера')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 относительно --compare (доля)'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rnd = random.Random(options['seed'])
+        seeded = User.objects.filter(username=f'{BENCH_PREFIX}0').exists()
+        if options['no_seed']:
+            if not seeded:
+                raise CommandError('Данные не найдены, запустите без --no-seed')
+        elif seeded:
+            raise CommandError(
+                'База уже наполнена, используйте --no-seed или другую базу'
+            )
+        else:
+            start = time.perf_counter()
+            self.seed()
+            self.stdout.write(
+                f'Данные созданы за {time.perf_counter() - start:.1f} с'
+            )
+
+        self.user = User.objects.get(username=f'{BENCH_PREFIX}0')
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        results = {}
+        for name, method, url, get_data in self.get_cases():
+            if options['only'] and options['only'] not in name:
+                continue
+            results[name] = self.measure(method, url, get_data)
+            self.report(name, results[name])
+
+        report = {
+            'meta': {
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'options': {
+                    key: options[key] for key in (
+                        'users', 'recipes', 'ingredients',
+                        'ingredients_per_recipe', 'favorites', 'carts',
+                        'subscriptions', 'iterations', 'warmup', 'seed',
+                    )
+                },
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(results)
+
+    def seed(self):
+        options = self.options
+        rnd = self.rnd
+        with open(INGREDIENTS_FILE, encoding='utf-8') as file:
+            names = [item['name'] for item in json.load(file)]
+        password = make_password(BENCH_PREFIX)
+
+        with transaction.atomic():
+            tag_ids = [
+                Tag.objects.create(
+                    name=f'{BENCH_PREFIX} {i}',
+                    color=f'#{i:06X}',
+                    slug=f'{BENCH_PREFIX}-{i}'
+                ).pk
+                for i in range(8)
+            ]
+            ingredient_ids = bulk_create_ids(Ingredient, (
+                Ingredient(
+                    name=f'{names[i % len(names)]} {i}',
+                    measurement_unit='г'
+                )
+                for i in range(options['ingredients'])
+            ))
+            user_ids = bulk_create_ids(User, (
+                User(
+                    username=f'{BENCH_PREFIX}{i}',
+                    email=f'{BENCH_PREFIX}{i}@example.com',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                    password=password,
+                )
+                for i in range(options['users'])
+            ))
+            recipe_ids = bulk_create_ids(Recipe, (
+                Recipe(
+                    author_id=rnd.choice(user_ids),
+                    name=f'Рецепт {i}',
+                    text=f'Описание рецепта {i}',
+                    cooking_time=rnd.randint(1, 180),
+                    image='static/recipe/bench.png',
+                )
+                for i in range(options['recipes'])
+            ))
+
+            per_recipe = min(
+                options['ingredients_per_recipe'], len(ingredient_ids)
+            )
+            RecipeIngredients.objects.bulk_create(
+                (
+                    RecipeIngredients(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=rnd.randint(1, 500)
+                    )
+                    for recipe_id in recipe_ids
+                    for ingredient_id in rnd.sample(
+                        ingredient_ids, per_recipe
+                    )
+                ),
+                batch_size=5000
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in recipe_ids
+                    for tag_id in rnd.sample(tag_ids, rnd.randint(1, 3))
+                ),
+                batch_size=5000
+            )
+            for model, count in (
+                (FavoriteRecipe, options['favorites']),
+                (ShoppingCart, options['carts']),
+            ):
+                model.objects.bulk_create(
+                    (
+                        model(user_id=user_id, recipe_id=recipe_id)
+                        for user_id in user_ids
+                        for recipe_id in rnd.sample(
+                            recipe_ids, min(count, len(recipe_ids))
+                        )
+                    ),
+                    batch_size=5000
+                )
+            Subscribe.objects.bulk_create(
+                (
+                    Subscribe(user_id=user_id, author_id=author_id)
+                    for user_id in user_ids
+                    for author_id in rnd.sample(
+                        user_ids, min(options['subscriptions'] + 1,
+                                      len(user_ids))
+                    )
+                    if author_id != user_id
+                ),
+                batch_size=5000
+            )
+            bump_catalog_version('tags')
+            bump_catalog_version('ingredients')
+        quiet = io.StringIO()
+        call_command('recount_counters', stdout=quiet)
+        call_command('rebuild_shopping_lists', stdout=quiet)
+        call_command('rebuild_search_index', stdout=quiet)
+        call_command('rebuild_tag_masks', stdout=quiet)
+        call_command('rebuild_timelines', stdout=quiet)
+        call_command('rebuild_similar', full=True, stdout=quiet)
+        call_command('rebuild_pantry_index', stdout=quiet)
+
+    def get_cases(self):
+        user = self.user
+        recipe = Recipe.objects.filter(author=user).order_by('pk').first()
+        if recipe is None:
+            recipe = Recipe.objects.order_by('pk').first()
+        tag, other_tag = Tag.objects.filter(
+            slug__startswith=BENCH_PREFIX
+        ).order_by('pk')[:2]
+        ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:5]
+        )
+        ingredient_name = Ingredient.objects.get(pk=ingredient_ids[0]).name
+        amounts = itertools.count(1)
+
+        def recipe_data():
+            return {
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': f'data:image/png;base64,{PNG}',
+                'tags': [tag.pk],
+                'ingredients': [
+                    {'id': pk, 'amount': next(amounts) % 100 + 1}
+                    for pk in ingredient_ids
+                ],
+            }
+
+        own, created = Recipe.objects.get_or_create(
+            author=user, name='Рецепт для обновления',
+            defaults={
+                'text': 'Описание',
+                'cooking_time': 5,
+                'image': 'static/recipe/bench.png',
+            }
+        )
+        if created:
+            own.tags.set([tag])
+        params = {
+            'tags': tag.slug,
+            'author': recipe.author_id,
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+        }
+        cases = []
+        for size in range(len(RECIPE_FILTERS) + 1):
+            for combination in itertools.combinations(RECIPE_FILTERS, size):
+                query = '&'.join(
+                    f'{name}={params[name]}' for name in combination
+                )
+                cases.append((
+                    f'recipes.list[{",".join(combination)}]', 'get',
+                    f'/api/recipes/?{query}' if query else '/api/recipes/',
+                    None
+                ))
+        cases += [
+            (
+                'recipes.list[tags_any]', 'get',
+                f'/api/recipes/?tags={tag.slug}&tags={other_tag.slug}', None
+            ),
+            (
+                'recipes.list[tags_all]', 'get',
+                f'/api/recipes/?tags={tag.slug}&tags={other_tag.slug}'
+                f'&tags_mode=all', None
+            ),
+            (
+                'recipes.list[search]', 'get',
+                f'/api/recipes/?search={ingredient_name.split()[0]}', None
+            ),
+            (
+                'recipes.list[cursor]', 'get',
+                '/api/recipes/?pagination=cursor', None
+            ),
+            ('recipes.retrieve', 'get', f'/api/recipes/{recipe.pk}/', None),
+            ('recipes.feed', 'get', '/api/recipes/feed/', None),
+            (
+                'recipes.similar', 'get',
+                f'/api/recipes/{recipe.pk}/similar/', None
+            ),
+            (
+                'recipes.pantry', 'get',
+                '/api/recipes/pantry/?ingredients='
+                + ','.join(str(pk) for pk in ingredient_ids), None
+            ),
+            (
+                'recipes.pantry[filtered]', 'get',
+                '/api/recipes/pantry/?ingredients='
+                + ','.join(str(pk) for pk in ingredient_ids)
+                + f'&tags={tag.slug}&cooking_time=30', None
+            ),
+            (
+                'users.subscriptions', 'get',
+                '/api/users/subscriptions/?recipes_limit=3', None
+            ),
+            ('ingredients.list', 'get', '/api/ingredients/', None),
+            (
+                'ingredients.search', 'get',
+                f'/api/ingredients/?name={ingredient_name[:3]}', None
+            ),
+            ('tags.list', 'get', '/api/tags/', None),
+            (
+                'recipes.download_shopping_cart', 'get',
+                '/api/recipes/download_shopping_cart/', None
+            ),
+            ('recipes.create', 'post', '/api/recipes/', recipe_data),
+            (
+                'recipes.partial_update', 'patch',
+                f'/api/recipes/{own.pk}/', recipe_data
+            ),
+        ]
+        return cases
+
+    def request(self, method, url, get_data):
+        kwargs = {}
+        if get_data is not None:
+            kwargs = {'data': get_data(), 'format': 'json'}
+        # При DEBUG журнал запросов после наполнения уже заполнен до
+        # предела, и без очистки счётчик запросов показывал бы ноль.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, len(queries), len(content)
+
+    def measure(self, method, url, get_data):
+        for _ in range(self.options['warmup']):
+            self.request(method, url, get_data)
+        timings, query_counts, sizes, statuses = [], [], [], set()
+        for _ in range(self.options['iterations']):
+            status, elapsed, queries, size = self.request(
+                method, url, get_data
+            )
+            statuses.add(status)
+            timings.append(elapsed)
+            query_counts.append(queries)
+            sizes.append(size)
+        timings.sort()
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(
+                timings[math.ceil(len(timings) * 0.95) - 1] * 1000, 3
+            ),
+            'queries': max(query_counts),
+            'bytes': max(sizes),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name}: p50 {result["p50_ms"]:.2f} мс, '
+            f'p95 {result["p95_ms"]:.2f} мс, '
+            f'запросов {result["queries"]}, {result["bytes"]} байт, '
+            f'статус {",".join(map(str, result["status"]))}'
+        )
+
+    def compare(self, results):
+        with open(self.options['compare'], encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        limit = 1 + self.options['threshold']
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            if result['queries'] > before['queries']:
+                regressions.append(
+                    f'{name}: запросов {before["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result['p95_ms'] > before['p95_ms'] * limit:
+                regressions.append(
+                    f'{name}: p95 {before["p95_ms"]:.2f} -> '
+                    f'{result["p95_ms"]:.2f} мс'
+                )
+        if regressions:
+            raise CommandError(
+                'Обнаружены регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено'))
@@ -0,0 +1,110 @@
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.search import IngredientIndex
+from recipes.models import Ingredient
+
+INGREDIENTS_FILE = (
+    Path(settings.BASE_DIR) / 'recipes/management/commands/ingredients.json'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск ингредиентов через istartswith/icontains и индекс '
+        'в памяти на синтетическом справочнике: по началу названия и по '
+        'подстроке из середины. Данные откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        with open(INGREDIENTS_FILE, encoding='utf-8') as file:
+            names = [item['name'] for item in json.load(file)]
+        queries = {
+            'начало': [
+                rnd.choice(names)[:rnd.randint(1, 4)]
+                for _ in range(options['queries'])
+            ],
+            'подстрока': [
+                self.infix(rnd, rnd.choice(names))
+                for _ in range(options['queries'])
+            ],
+        }
+
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'{names[i % len(names)]} {i}',
+                        measurement_unit='г'
+                    )
+                    for i in range(options['size'])
+                ),
+                batch_size=5000
+            )
+            self.run(queries, options['limit'])
+            transaction.set_rollback(True)
+
+    def infix(self, rnd, name):
+        """Подстрока из 2-4 символов не с начала названия."""
+        length = rnd.randint(2, 4)
+        if len(name) <= length:
+            return name[-2:]
+        start = rnd.randint(1, len(name) - length)
+        return name[start:start + length]
+
+    def run(self, queries, limit):
+        start = time.perf_counter()
+        index = IngredientIndex(
+            Ingredient.objects.values_list('pk', 'name').iterator()
+        )
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        grams = len(index.grams)
+        build_grams = time.perf_counter() - start
+
+        self.stdout.write(f'Справочник: {len(index.keys)} ингредиентов')
+        self.stdout.write(
+            f'Построение индекса: {build * 1000:.1f} мс, '
+            f'n-граммы ({grams}): {build_grams * 1000:.1f} мс'
+        )
+        lookups = {'начало': 'istartswith', 'подстрока': 'icontains'}
+        for name, group in queries.items():
+            old = []
+            for query in group:
+                start = time.perf_counter()
+                list(Ingredient.objects.filter(
+                    **{f'name__{lookups[name]}': query}
+                ))
+                old.append(time.perf_counter() - start)
+
+            new = []
+            for query in group:
+                start = time.perf_counter()
+                ids = index.search(query, limit)
+                list(Ingredient.objects.filter(pk__in=ids))
+                new.append(time.perf_counter() - start)
+
+            self.report(f'{name}, {lookups[name]}', old)
+            self.report(f'{name}, индекс (limit={limit})', new)
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f'{name}: среднее {statistics.mean(timings) * 1000:.2f} мс, '
+            f'p95 {p95 * 1000:.2f} мс'
+        )
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность режимов wsgi и asgi при '
+        'медленных клиентах. Серверы gunicorn запускаются командой либо '
+        'задаются адресами --wsgi-url/--asgi-url.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url')
+        parser.add_argument('--asgi-url')
+        parser.add_argument('--path', default='/api/recipes/')
+        parser.add_argument('--token')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--clients', type=int, default=10)
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.5,
+            help='Пауза медленного клиента между строками заголовков, с.'
+        )
+        parser.add_argument('--slow-headers', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        self.options = options
+        servers = []
+        try:
+            for mode, port in (('wsgi', 7101), ('asgi', 7102)):
+                url = options[f'{mode}_url']
+                if url is None:
+                    url = f'http://127.0.0.1:{port}'
+                    servers.append(self.start_server(mode, port))
+                self.wait_ready(url)
+                result = asyncio.run(self.run(url))
+                self.report(mode, result)
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+
+    def start_server(self, mode, port):
+        env = {
+            **os.environ,
+            'SERVER_MODE': mode,
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_WORKERS': str(self.options['workers']),
+        }
+        return subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '--config', 'gunicorn.conf.py',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def wait_ready(self, url):
+        address = urlsplit(url)
+        deadline = time.monotonic() + self.options['timeout']
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(
+                    (address.hostname, address.port), timeout=1
+                ).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Сервер {url} не запустился')
+
+    def request_lines(self, host):
+        lines = [
+            f'GET {self.options["path"]} HTTP/1.1',
+            f'Host: {host}',
+            'Accept: application/json',
+            'Connection: close',
+        ]
+        if self.options['token']:
+            lines.append(f'Authorization: Token {self.options["token"]}')
+        return [f'{line}\r\n'.encode() for line in lines]
+
+    async def fetch(self, address, slow=False):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address.hostname, address.port),
+            self.options['timeout']
+        )
+        try:
+            lines = self.request_lines(address.netloc)
+            if slow:
+                for number in range(self.options['slow_headers']):
+                    writer.write(lines[0] if number == 0 else
+                                 f'X-Slow-{number}: 1\r\n'.encode())
+                    await writer.drain()
+                    await asyncio.sleep(self.options['slow_delay'])
+                lines = lines[1:]
+            writer.write(b''.join(lines) + b'\r\n')
+            await writer.drain()
+            response = await asyncio.wait_for(
+                reader.read(), self.options['timeout']
+            )
+        finally:
+            writer.close()
+        status = response.split(b' ', 2)[1] if response else b'0'
+        return int(status), len(response)
+
+    async def fast_client(self, address, deadline, result):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status, size = await self.fetch(address)
+            except (OSError, asyncio.TimeoutError):
+                result['errors'] += 1
+                continue
+            if status >= 500:
+                result['errors'] += 1
+                continue
+            result['latencies'].append(time.perf_counter() - start)
+            result['bytes'] += size
+
+    async def slow_client(self, address, deadline):
+        while time.monotonic() < deadline:
+            try:
+                await self.fetch(address, slow=True)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+    async def run(self, url):
+        address = urlsplit(url)
+        deadline = time.monotonic() + self.options['duration']
+        result = {'latencies': [], 'errors': 0, 'bytes': 0}
+        slow = [
+            asyncio.create_task(self.slow_client(address, deadline))
+            for _ in range(self.options['slow_clients'])
+        ]
+        # Медленные клиенты успевают занять соединения до начала замера.
+        await asyncio.sleep(self.options['slow_delay'])
+        await asyncio.gather(*(
+            self.fast_client(address, deadline, result)
+            for _ in range(self.options['clients'])
+        ))
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+        return result
+
+    def report(self, mode, result):
+        latencies = sorted(result['latencies'])
+        duration = self.options['duration']
+        line = (
+            f'{mode}: {len(latencies)} запросов, '
+            f'{len(latencies) / duration:.1f} запр/с, '
+            f'ошибок {result["errors"]}'
+        )
+        if latencies:
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+            line += (
+                f', p50 {statistics.median(latencies) * 1000:.1f} мс, '
+                f'p95 {p95 * 1000:.1f} мс'
+            )
+        self.stdout.write(line)
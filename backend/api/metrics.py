@@ -0,0 +1,186 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from django.http import HttpResponse
+
+from backend.db.pool import pool_stats
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Показатели одного запроса, накапливаемые по ходу его обработки."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view = 'unmatched'
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def sql_execute_wrapper(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_count += 1
+        metrics.sql_time += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """Учитывает время сериализации в показателях запроса.
+
+    Вложенные сериалайзеры повторно не учитываются, SQL-запросы,
+    выполненные при сериализации, входят в её время.
+    """
+
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return super().to_representation(instance)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializing = False
+            metrics.serializer_time += time.perf_counter() - start
+
+
+def format_labels(labels):
+    return ','.join(
+        f'{name}="{value}"' for name, value in labels
+    )
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    'buckets': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, values in series:
+            labels = tuple(zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, values['buckets']):
+                bucket = format_labels(labels + (('le', bound),))
+                lines.append(f'{self.name}_bucket{{{bucket}}} {count}')
+            bucket = format_labels(labels + (('le', '+Inf'),))
+            lines.append(f'{self.name}_bucket{{{bucket}}} {values["count"]}')
+            lines.append(
+                f'{self.name}_sum{{{format_labels(labels)}}} {values["sum"]}'
+            )
+            lines.append(
+                f'{self.name}_count{{{format_labels(labels)}}} '
+                f'{values["count"]}'
+            )
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', 'method', 'status'),
+    LATENCY_BUCKETS,
+)
+SQL_QUERIES = Histogram(
+    'foodgram_sql_queries',
+    'Число SQL-запросов на запрос.',
+    ('view',),
+    QUERY_BUCKETS,
+)
+SQL_DURATION = Histogram(
+    'foodgram_sql_duration_seconds',
+    'Суммарное время SQL-запросов на запрос.',
+    ('view',),
+    LATENCY_BUCKETS,
+)
+SERIALIZER_DURATION = Histogram(
+    'foodgram_serializer_duration_seconds',
+    'Время сериализации ответа.',
+    ('view',),
+    LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер тела ответа.',
+    ('view',),
+    SIZE_BUCKETS,
+)
+HISTOGRAMS = (
+    REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, SERIALIZER_DURATION,
+    RESPONSE_SIZE,
+)
+POOL_METRICS = (
+    ('in_use', 'gauge', 'Соединения, выданные из пула.'),
+    ('idle', 'gauge', 'Свободные соединения в пуле.'),
+    ('utilization', 'gauge', 'Доля занятых соединений пула.'),
+    ('acquired', 'counter', 'Выдано соединений из пула.'),
+    ('created', 'counter', 'Открыто новых соединений.'),
+    ('discarded', 'counter', 'Закрыто неисправных соединений.'),
+    ('timeouts', 'counter', 'Истекло ожиданий свободного соединения.'),
+    ('wait_seconds_total', 'counter', 'Суммарное ожидание соединения.'),
+)
+
+
+def pool_lines():
+    stats = pool_stats()
+    lines = []
+    for key, kind, help_text in POOL_METRICS:
+        name = f'foodgram_db_pool_{key}'
+        if kind == 'counter' and not name.endswith('_total'):
+            name += '_total'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [
+            f'{name}{{alias="{alias}"}} {values[key]}'
+            for alias, values in sorted(stats.items())
+        ]
+    return lines
+
+
+def metrics_view(request):
+    """Метрики текущего процесса в текстовом формате Prometheus."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.expose()
+    lines += pool_lines()
+    return HttpResponse(
+        '\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
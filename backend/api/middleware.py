@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import (REQUEST_DURATION, RESPONSE_SIZE, SERIALIZER_DURATION,
+                      SQL_DURATION, SQL_QUERIES, RequestMetrics,
+                      current_metrics)
+
+
+def view_label(view_func, method):
+    """Имя действия вьюсета (RecipeViewSet.list) или представления."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(method.lower(), method.lower())
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class PerformanceMiddleware(MiddlewareMixin):
+    """Собирает время ответа, число и время SQL-запросов, время
+    сериализации и размер ответа с разбивкой по действиям вьюсетов.
+
+    Показатели отдаются на /metrics, а при SERVER_TIMING=True ещё и в
+    заголовке Server-Timing каждого ответа.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view = view_label(view_func, request.method)
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.start
+        view = metrics.view
+        REQUEST_DURATION.observe(
+            duration, view, request.method, str(response.status_code)
+        )
+        SQL_QUERIES.observe(metrics.sql_count, view)
+        SQL_DURATION.observe(metrics.sql_time, view)
+        SERIALIZER_DURATION.observe(metrics.serializer_time, view)
+        if response.streaming:
+            response.streaming_content = self.count_streamed(
+                response.streaming_content, view
+            )
+        else:
+            RESPONSE_SIZE.observe(len(response.content), view)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'total;dur={duration * 1000:.1f}, '
+                f'sql;dur={metrics.sql_time * 1000:.1f};'
+                f'desc="{metrics.sql_count} queries", '
+                f'serializer;dur={metrics.serializer_time * 1000:.1f}'
+            )
+        return response
+
+    def count_streamed(self, content, view):
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        RESPONSE_SIZE.observe(size, view)
@@ -1,5 +1,51 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Пагинация по курсору без подсчёта общего количества объектов."""
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(queryset.model._meta.ordering) or (self.ordering,)
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def is_cursor_mode(self, request):
+        params = request.query_params
+        return (params.get(self.mode_query_param) == self.cursor_mode
+                or IdCursorPagination.cursor_query_param in params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = IdCursorPagination()
+            # Курсор строится по id, поэтому другой порядок (например, по
+            # релевантности поиска) он бы молча заменил.
+            ordering = self.cursor_paginator.get_ordering(
+                request, queryset, view
+            )
+            if queryset.query.order_by and (
+                tuple(queryset.query.order_by) != ordering
+            ):
+                raise ValidationError(
+                    {'error': 'Пагинация по курсору недоступна для '
+                              'запроса со своей сортировкой, например '
+                              'с поиском.'}
+                )
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Сам список отдаётся по частям через iter_render, render используется
+    только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def iter_render(self, title, ingredients):
+        raise NotImplementedError
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def iter_render(self, title, ingredients):
+        yield f'{title}\n'.encode(self.charset)
+        for ingredient in ingredients:
+            yield (
+                f'- {ingredient["ingredient__name"]}'
+                f'({ingredient["ingredient__measurement_unit"]})'
+                f'- {ingredient["amount"]}\n'
+            ).encode(self.charset)
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def iter_render(self, title, ingredients):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+        for ingredient in ingredients:
+            writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['amount'],
+            ))
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    def iter_render(self, title, ingredients):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        line_height = self.font_size * 1.5
+        y = height - self.margin
+        lines = [title] + [
+            f'{ingredient["ingredient__name"]} '
+            f'({ingredient["ingredient__measurement_unit"]}) — '
+            f'{ingredient["amount"]}'
+            for ingredient in ingredients
+        ]
+        for line in lines:
+            if y < self.margin:
+                pdf.showPage()
+                y = height - self.margin
+            pdf.setFont(self.font_name, self.font_size)
+            pdf.drawString(self.margin, y, line)
+            y -= line_height
+        pdf.save()
+        yield buffer.getvalue()
@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from recipes.models import Ingredient
+
+from .catalog import get_catalog_version
+
+# Длины n-грамм индекса подстрок. Запросы из одного символа почти всегда
+# набирают лимит совпадениями по началу названия, поэтому для них
+# отдельный индекс не строится.
+GRAM_SIZES = (2, 3)
+
+_index = None
+
+
+class IngredientIndex:
+    """Отсортированный в памяти индекс названий ингредиентов.
+
+    Совпадения по началу названия ищутся бинарным поиском, совпадения
+    по подстроке добавляются после них, если лимит ещё не исчерпан.
+    Подстроки ищутся среди названий с самой редкой n-граммой запроса,
+    а не перебором всего справочника.
+    """
+
+    def __init__(self, rows):
+        self.rows = sorted(
+            (name.lower(), pk) for pk, name in rows
+        )
+        self.keys = [key for key, pk in self.rows]
+        self._grams = None
+
+    @property
+    def grams(self):
+        """{n-грамма: позиции названий с ней}, строится при первом поиске
+        по подстроке."""
+        if self._grams is None:
+            grams = defaultdict(list)
+            for position, key in enumerate(self.keys):
+                for gram in {
+                    key[start:start + size]
+                    for size in GRAM_SIZES
+                    for start in range(len(key) - size + 1)
+                }:
+                    grams[gram].append(position)
+            self._grams = {
+                gram: array('I', positions)
+                for gram, positions in grams.items()
+            }
+        return self._grams
+
+    def substring_candidates(self, query):
+        """Позиции названий, которые могут содержать query, по возрастанию."""
+        size = min(len(query), GRAM_SIZES[-1])
+        if size < GRAM_SIZES[0]:
+            return range(len(self.rows))
+        empty = array('I')
+        return min(
+            (
+                self.grams.get(query[start:start + size], empty)
+                for start in range(len(query) - size + 1)
+            ),
+            key=len
+        )
+
+    def search(self, query, limit):
+        query = query.lower()
+        position = bisect_left(self.keys, query)
+        ids = []
+        while position < len(self.rows) and len(ids) < limit:
+            key, pk = self.rows[position]
+            if not key.startswith(query):
+                break
+            ids.append(pk)
+            position += 1
+        if len(ids) < limit:
+            for position in self.substring_candidates(query):
+                key, pk = self.rows[position]
+                if query in key and not key.startswith(query):
+                    ids.append(pk)
+                    if len(ids) >= limit:
+                        break
+        return ids
+
+
+def get_ingredient_index():
+    """Возвращает индекс, пересобирая его при смене версии справочника."""
+    global _index
+    etag = get_catalog_version('ingredients')['etag']
+    if _index is None or _index[0] != etag:
+        rows = Ingredient.objects.values_list('pk', 'name')
+        _index = (etag, IngredientIndex(rows.iterator()))
+    return _index[1]
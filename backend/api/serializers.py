@@ -1,5 +1,10 @@
+import uuid
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Manager, prefetch_related_objects
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
@@ -9,15 +14,23 @@ from rest_framework.fields import SerializerMethodField
 from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 
-from backend.constants import MIN_VALUE, MAX_VALUE
+from backend.constants import (IMAGE_UPLOAD_MAX_SIZE, IMAGE_UPLOAD_TTL,
+                               MAX_VALUE, MIN_VALUE)
+from recipes.cart import change_recipe_ingredients
+from recipes.images import accepts_webp, image_url
+from recipes.pantry import change_postings
 from recipes.models import (
-    Ingredient, Recipe, RecipeIngredients, Subscribe, Tag
+    ImageUpload, Ingredient, Recipe, RecipeIngredients, Subscribe, Tag,
+    recipe_related_lookups
 )
 
+from .cache import cache_recipe, get_cached_recipes
+from .metrics import TimedSerializerMixin
+
 User = get_user_model()
 
 
-class IngredientSerializer(ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, ModelSerializer):
     """Сериалайзер для ингредиентов."""
 
     class Meta:
@@ -25,15 +38,20 @@ class IngredientSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class TagSerializer(ModelSerializer):
+class TagSerializer(TimedSerializerMixin, ModelSerializer):
     """Сериалайзер для тегов."""
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'color',
+            'slug'
+        )
 
 
-class UsersSerializer(UserSerializer):
+class UsersSerializer(TimedSerializerMixin, UserSerializer):
     """Сериалайзер для пользователей."""
     is_subscribed = SerializerMethodField(read_only=True)
 
@@ -49,6 +67,8 @@ class UsersSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         if user.is_authenticated:
             return Subscribe.objects.filter(user=user, author=obj).exists()
@@ -78,20 +98,44 @@ class UsersCreateSerializer(UserCreateSerializer):
 
 
 class IngredientReadSerializer(serializers.Serializer):
-    id = serializers.IntegerField()
-    name = serializers.CharField()
-    measurement_unit = serializers.CharField()
-    amount = serializers.FloatField()
+    """Сериалайзер для ингредиентов рецепта. Режим чтения."""
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField()
+
+
+class RecipeListSerializer(TimedSerializerMixin,
+                           serializers.ListSerializer):
+    """Список рецептов: общая часть берётся из кеша одним запросом."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        self.child.cached = get_cached_recipes(recipes)
+        prefetch_related_objects(
+            [recipe for recipe in recipes
+             if recipe.pk not in self.child.cached],
+            *recipe_related_lookups(self.context['request'].user)
+        )
+        return super().to_representation(recipes)
+
 
+class RecipeReadSerializer(TimedSerializerMixin, ModelSerializer):
+    """Сериалайзер для рецептов. Режим безопасных методов.
 
-class RecipeReadSerializer(ModelSerializer):
-    """Сериалайзер для рецептов. Режим безопасных методов."""
+    Часть ответа, одинаковая для всех пользователей, кешируется по рецепту,
+    флаги текущего пользователя берутся из аннотаций queryset. Изображение
+    в кеш не попадает: варианты готовит отдельный процесс process_images,
+    поэтому ссылка строится по загруженной строке рецепта.
+    """
     tags = TagSerializer(many=True, read_only=True)
     author = UsersSerializer(read_only=True)
     image = Base64ImageField()
     ingredients = SerializerMethodField()
-    is_favorited = SerializerMethodField(read_only=True)
-    is_in_shopping_cart = SerializerMethodField(read_only=True)
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -107,34 +151,94 @@ class RecipeReadSerializer(ModelSerializer):
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
 
     def get_ingredients(self, obj):
         recipe_ingredients = obj.ingredient_list.all()
-        ingredient_serializer = IngredientSerializer(
+        ingredient_serializer = IngredientReadSerializer(
             instance=recipe_ingredients,
             many=True
         )
         return ingredient_serializer.data
 
-    def is_user_anonymous(self):
-        return self.context['request'].user.is_anonymous
+    def get_shared_representation(self, instance):
+        cached = getattr(self, 'cached', None)
+        if cached is None:
+            cached = get_cached_recipes([instance])
+        data = cached.get(instance.pk)
+        if data is None:
+            user = self.context['request'].user
+            prefetch_related_objects(
+                [instance], *recipe_related_lookups(user)
+            )
+            data = super().to_representation(instance)
+            data['is_favorited'] = False
+            data['is_in_shopping_cart'] = False
+            if data['author'] is not None:
+                data['author']['is_subscribed'] = False
+            # Место поля сохраняется, чтобы не менять порядок ключей.
+            data['image'] = None
+            cache_recipe(instance, data)
+        return data
 
-    def get_is_favorited(self, obj):
-        if self.is_user_anonymous():
-            return False
-        user = self.context['request'].user
-        return user.favorites.filter(recipe=obj).exists()
+    def to_representation(self, instance):
+        data = dict(self.get_shared_representation(instance))
+        data['is_favorited'] = instance.is_favorited
+        data['is_in_shopping_cart'] = instance.is_in_shopping_cart
+        if data['author'] is not None:
+            data['author'] = dict(data['author'])
+            data['author']['is_subscribed'] = instance.is_author_subscribed
+        request = self.context['request']
+        variant = 'list' if self.parent is not None else 'detail'
+        url = image_url(
+            instance.image.name,
+            instance.image_variants,
+            variant,
+            accepts_webp(request)
+        )
+        data['image'] = request.build_absolute_uri(url) if url else None
+        return data
 
-    def get_is_in_shopping_cart(self, obj):
-        if self.is_user_anonymous():
-            return False
-        user = self.context['request'].user
-        return user.shopping_cart.filter(recipe=obj).exists()
+
+class ImageUploadSerializer(TimedSerializerMixin, ModelSerializer):
+    """Сериалайзер для отдельной загрузки изображения рецепта."""
+
+    class Meta:
+        model = ImageUpload
+        fields = ('token', 'image')
+        read_only_fields = ('token',)
+        extra_kwargs = {'image': {'write_only': True}}
+
+    def validate_image(self, value):
+        if value.size > IMAGE_UPLOAD_MAX_SIZE:
+            raise ValidationError('Файл изображения слишком большой!')
+        return value
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение в base64 или токен из /api/uploads/."""
+
+    def to_internal_value(self, data):
+        try:
+            token = uuid.UUID(str(data))
+        except ValueError:
+            return super().to_internal_value(data)
+        upload = ImageUpload.objects.filter(
+            token=token,
+            user=self.context['request'].user,
+            created_at__gte=timezone.now() - timedelta(
+                seconds=IMAGE_UPLOAD_TTL
+            )
+        ).first()
+        if upload is None:
+            raise ValidationError('Загрузка изображения не найдена!')
+        self.parent.image_upload = upload
+        return upload.image
 
 
 class RecipeIngredientsWriteSerializer(ModelSerializer):
     """Сериалайзер для модели добавления ингредиентов в рецепт."""
-    id = serializers.SerializerMethodField()
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         min_value=MIN_VALUE,
         max_value=MAX_VALUE,
@@ -148,22 +252,16 @@ class RecipeIngredientsWriteSerializer(ModelSerializer):
         model = RecipeIngredients
         fields = ('id', 'amount')
 
-    def get_id(self, instance):
-        return instance.ingredient.id
 
-
-class RecipeWriteSerializer(ModelSerializer):
+class RecipeWriteSerializer(TimedSerializerMixin, ModelSerializer):
     """Сериалайзер для рецептов. Режим методов записи."""
     tags = PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
     author = UsersSerializer(read_only=True)
-    image = Base64ImageField()
-    ingredients = RecipeIngredientsWriteSerializer(
-        many=True,
-        read_only=True
-    )
+    image = RecipeImageField()
+    ingredients = RecipeIngredientsWriteSerializer(many=True)
     cooking_time = serializers.IntegerField(
         min_value=MIN_VALUE,
         max_value=MAX_VALUE,
@@ -198,7 +296,10 @@ class RecipeWriteSerializer(ModelSerializer):
                 {'ingredients': 'Нужен хотя бы один ингредиент!'}
             )
 
-        ingredients_list = []
+        existing = Ingredient.objects.in_bulk(
+            [item['id'] for item in ingredients if 'id' in item]
+        )
+        seen = set()
 
         for item in ingredients:
             if 'id' not in item:
@@ -206,19 +307,17 @@ class RecipeWriteSerializer(ModelSerializer):
                     {'ingredients': 'Указан некорректный формат ингредиента!'}
                 )
 
-            try:
-                ingredient = Ingredient.objects.get(id=item['id'])
-            except Ingredient.DoesNotExist:
+            if item['id'] not in existing:
                 raise ValidationError(
                     {'ingredients': 'Ингредиент не существует!'}
                 )
 
-            if ingredient in ingredients_list:
+            if item['id'] in seen:
                 raise ValidationError(
                     {'ingredients': 'Ингредиенты не могут повторяться!'}
                 )
 
-            ingredients_list.append(ingredient)
+            seen.add(item['id'])
 
         return value
 
@@ -228,53 +327,113 @@ class RecipeWriteSerializer(ModelSerializer):
             raise ValidationError(
                 {'tags': 'Нужно выбрать хотя бы один тег!'}
             )
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError(
-                    {'tags': 'Теги должны быть уникальными!'}
-                )
-            tags_list.append(tag)
+        if len(set(tags)) != len(tags):
+            raise ValidationError(
+                {'tags': 'Теги должны быть уникальными!'}
+            )
         return value
 
     def create_ingredients(self, ingredients, recipe):
         instances = [
             RecipeIngredients(
-                ingredient=Ingredient.objects.get(id=ingredient['id']),
+                ingredient_id=ingredient['id'],
                 recipe=recipe,
                 amount=ingredient['amount']
             )
             for ingredient in ingredients
         ]
         RecipeIngredients.objects.bulk_create(instances)
+        change_recipe_ingredients(
+            recipe.id,
+            {item.ingredient_id: item.amount for item in instances}
+        )
+        change_postings(
+            recipe.id, added=[item.ingredient_id for item in instances]
+        )
 
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
         tags_data = validated_data.pop('tags', [])
         user = self.context['request'].user
-        recipe = Recipe.objects.create(author=user, **validated_data)
-        recipe.tags.set(tags_data)
-        self.create_ingredients(ingredients_data, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=user, **validated_data)
+            recipe.tags.set(tags_data)
+            self.create_ingredients(ingredients_data, recipe)
+            self.consume_image_upload()
         return recipe
 
+    def consume_image_upload(self):
+        upload = getattr(self, 'image_upload', None)
+        if upload is not None:
+            upload.delete()
+
+    def update_ingredients(self, ingredients, recipe):
+        """Применяет к рецепту только разницу между старыми и новыми
+        ингредиентами: удаляет лишние, добавляет новые и меняет
+        количество у изменившихся."""
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredients.objects.filter(recipe=recipe)
+        }
+        incoming = {item['id']: item['amount'] for item in ingredients}
+
+        removed = [
+            item.pk for ingredient_id, item in current.items()
+            if ingredient_id not in incoming
+        ]
+        if removed:
+            RecipeIngredients.objects.filter(pk__in=removed).delete()
+
+        added = [
+            RecipeIngredients(
+                ingredient_id=ingredient_id,
+                recipe=recipe,
+                amount=amount
+            )
+            for ingredient_id, amount in incoming.items()
+            if ingredient_id not in current
+        ]
+        RecipeIngredients.objects.bulk_create(added)
+        change_postings(
+            recipe.id, added=[item.ingredient_id for item in added]
+        )
+
+        changed = []
+        deltas = {item.ingredient_id: item.amount for item in added}
+        for ingredient_id, amount in incoming.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        change_recipe_ingredients(recipe.id, deltas)
+
     def update(self, instance, validated_data):
-        if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
-        if 'tags' in validated_data:
-            instance.tags.set(validated_data.pop('tags'))
-        return super().update(instance, validated_data)
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+        with transaction.atomic():
+            if 'ingredients' in validated_data:
+                self.update_ingredients(
+                    validated_data.pop('ingredients'), instance
+                )
+            if 'tags' in validated_data:
+                instance.tags.set(validated_data.pop('tags'))
+            self.consume_image_upload()
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=context).data
 
 
-class RecipeShortSerializer(ModelSerializer):
+class RecipeShortSerializer(TimedSerializerMixin, ModelSerializer):
     """Сериалайзер для рецептов. Режим краткого ответа на запрос."""
-    image = Base64ImageField()
+    image = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -285,6 +444,49 @@ class RecipeShortSerializer(ModelSerializer):
             'cooking_time'
         )
 
+    def get_image(self, obj):
+        request = self.context.get('request')
+        url = image_url(
+            obj.image.name,
+            obj.image_variants,
+            'thumbnail',
+            accepts_webp(request)
+        )
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class PantryRecipeSerializer(RecipeShortSerializer):
+    """Сериалайзер для рецептов, подобранных по имеющимся ингредиентам."""
+    matched_count = serializers.IntegerField(read_only=True)
+    ingredients_count = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + (
+            'matched_count',
+            'ingredients_count',
+            'coverage'
+        )
+
+
+def get_recipes_limit(request):
+    """Параметр recipes_limit: положительное число или None."""
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValidationError(
+            {'error': 'Параметр recipes_limit должен быть положительным '
+                      'числом.'}
+        )
+    return limit
+
 
 class SubscribeSerializer(UsersSerializer):
     """Сериалайзер для логики подписок."""
@@ -315,24 +517,31 @@ class SubscribeSerializer(UsersSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         if user.is_authenticated:
             return user.subscriber.filter(author=obj).exists()
         return False
 
     def get_recipes(self, obj):
-        limit = self.context.get(
-            'request'
-        ).query_params.get('recipes_limit')
-        if limit:
-            queryset = obj.recipes.order_by('-id')[:int(limit)]
+        if 'recipes' in self.context:
+            queryset = self.context['recipes'].get(obj.id, [])
         else:
-            queryset = obj.recipes.all()
+            limit = get_recipes_limit(self.context['request'])
+            if limit:
+                queryset = obj.recipes.order_by('-id')[:limit]
+            else:
+                queryset = obj.recipes.all()
 
         return RecipeShortSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
+
+    def validate(self, data):
+        get_recipes_limit(self.context['request'])
+        return data
 
     def create(self, validated_data):
         request = self.context['request']
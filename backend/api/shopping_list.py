@@ -0,0 +1,76 @@
+import uuid
+
+from django.core.cache import cache
+
+from backend.constants import SHOPPING_LIST_CACHE_TIMEOUT
+from recipes.models import ShoppingCart, ShoppingCartVersion, ShoppingListItem
+
+
+def get_cart_version(user_id):
+    """Возвращает текущую версию корзины пользователя, создавая её при
+    отсутствии.
+
+    Версия читается из базы, поэтому общая для всех процессов.
+    """
+    versions = ShoppingCartVersion.objects.filter(
+        user_id=user_id
+    ).values_list('version', flat=True)
+    version = versions.first()
+    if version is None:
+        ShoppingCartVersion.objects.bulk_create(
+            [ShoppingCartVersion(user_id=user_id, version=uuid.uuid4().hex)],
+            ignore_conflicts=True
+        )
+        version = versions.get()
+    return version
+
+
+def bump_cart_versions(user_ids):
+    """Меняет версии корзин в текущей транзакции: другие процессы
+    увидят их вместе с изменённой корзиной."""
+    ShoppingCartVersion.objects.filter(user_id__in=user_ids).update(
+        version=uuid.uuid4().hex
+    )
+
+
+def bump_carts_with_recipes(recipe_ids):
+    bump_cart_versions(
+        ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('user_id')
+    )
+
+
+def get_shopping_list_ingredients(user):
+    """Возвращает готовые суммы ингредиентов из списка покупок."""
+    return ShoppingListItem.objects.filter(
+        user=user,
+        amount__gt=0
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def iter_shopping_list(user, renderer):
+    """Отдаёт файл списка покупок по частям, кешируя его по версии корзины.
+
+    Пока версия корзины не изменилась, повторная выгрузка берётся из кеша
+    без повторной агрегации ингредиентов.
+    """
+    key = (
+        f'shopping_list:{user.id}:{get_cart_version(user.id)}:'
+        f'{renderer.format}'
+    )
+    content = cache.get(key)
+    if content is not None:
+        yield content
+        return
+    chunks = []
+    title = f'Что купить для {user.get_username()}:'
+    ingredients = get_shopping_list_ingredients(user).iterator()
+    for chunk in renderer.iter_render(title, ingredients):
+        chunks.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(chunks), SHOPPING_LIST_CACHE_TIMEOUT)
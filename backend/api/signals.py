@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+
+from .authentication import invalidate_token
+from .cache import invalidate_recipes
+from .catalog import bump_catalog_version
+from .metrics import sql_execute_wrapper
+from .shopping_list import bump_cart_versions, bump_carts_with_recipes
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, update_fields=None, **kwargs):
+    # Изображение в кеш не попадает, а сохранённый экземпляр получает
+    # новую версию, чтобы его представление не читалось по старому ключу.
+    if update_fields is not None and set(update_fields) == {'image_variants'}:
+        return
+    instance.cache_version = invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    # После очистки связей рецепты тега уже не найти, поэтому их версии
+    # меняются до неё.
+    if reverse and action == 'pre_clear':
+        invalidate_recipes(instance.recipes.values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        instance.cache_version = invalidate_recipes([instance.pk])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_catalog_changed(sender, instance, **kwargs):
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version('tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version('ingredients')
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    bump_cart_versions([instance.user_id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_in_carts_changed(sender, instance, created, update_fields=None,
+                            **kwargs):
+    if update_fields is not None and set(update_fields) == {'image_variants'}:
+        return
+    if not created:
+        bump_carts_with_recipes([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_in_carts_changed(sender, instance, **kwargs):
+    bump_carts_with_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_in_carts_changed(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_carts_with_recipes([instance.pk])
+    elif pk_set:
+        bump_carts_with_recipes(pk_set)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_in_carts_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_carts_with_recipes(
+            instance.recipes.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_tokens_changed(sender, instance, created, **kwargs):
+    if not created:
+        for key in Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True):
+            invalidate_token(key)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if sql_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_execute_wrapper)
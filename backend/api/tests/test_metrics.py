@@ -0,0 +1,15 @@
+from django.test import SimpleTestCase, override_settings
+
+from backend import settings as project_settings
+
+
+class MetricsTests(SimpleTestCase):
+
+    @override_settings(ALLOWED_HOSTS=project_settings.ALLOWED_HOSTS)
+    def test_scraped_by_service_name(self):
+        """Prometheus обращается к backend:7000 внутри сети Docker."""
+        response = self.client.get('/metrics', HTTP_HOST='backend:7000')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response['Content-Type'].startswith('text/plain; version=0.0.4')
+        )
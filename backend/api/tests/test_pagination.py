@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='password'
+        )
+        for name in ('Каша манная', 'Суп', 'Каша'):
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10,
+                image='static/recipe/test.png'
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_follows_id_order(self):
+        response = self.client.get(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_cursor_with_search_is_rejected(self):
+        """Курсор не подменяет порядок по релевантности."""
+        self.assertEqual(
+            self.client.get('/api/recipes/', {'search': 'каша'}).status_code,
+            200
+        )
+        response = self.client.get(
+            '/api/recipes/', {'search': 'каша', 'pagination': 'cursor'}
+        )
+        self.assertEqual(response.status_code, 400)
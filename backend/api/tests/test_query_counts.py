@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import invalidate_token
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredients, ShoppingCart, Subscribe, Tag)
+
+User = get_user_model()
+
+PAGE_SIZES = (6, 20)
+
+
+class QueryCountTests(TestCase):
+    """Число SQL-запросов на страницу не зависит от её размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='password'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Author', last_name=str(i), password='password'
+            )
+            for i in range(25)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {i}', color=f'#00000{i}', slug=f'tag-{i}'
+            )
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(5)
+        ]
+        for number, author in enumerate(authors):
+            for i in range(2):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {number}-{i}',
+                    text='Описание',
+                    cooking_time=10,
+                    image='static/recipe/test.png'
+                )
+                recipe.tags.set(tags[:i + 1])
+                for ingredient in ingredients[:3]:
+                    RecipeIngredients.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=10
+                    )
+                if number % 2:
+                    FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+                if number % 3:
+                    ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            Subscribe.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_page_queries(self, client, url, queries):
+        for page_size in PAGE_SIZES:
+            with self.subTest(url=url, page_size=page_size):
+                # Каждая страница запрашивается с холодными кешами рецептов
+                # и токенов.
+                cache.clear()
+                invalidate_token(self.token.key)
+                with self.assertNumQueries(queries):
+                    response = client.get(url, {'limit': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_recipes_anonymous(self):
+        self.assert_page_queries(self.anonymous, '/api/recipes/', 5)
+
+    def test_recipes_authenticated(self):
+        self.assert_page_queries(self.client, '/api/recipes/', 6)
+
+    def test_subscriptions_anonymous(self):
+        with self.assertNumQueries(0):
+            response = self.anonymous.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_subscriptions_authenticated(self):
+        self.assert_page_queries(
+            self.client, '/api/users/subscriptions/', 4
+        )
@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+
+User = get_user_model()
+
+
+class RecipeCacheTests(TestCase):
+    """Правка рецепта в одном процессе не оставляет устаревшее
+    представление в кеше другого."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='password'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000000', slug='breakfast'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Каша', text='Описание', cooking_time=10,
+            image='static/recipe/test.png'
+        )
+        cls.recipe.tags.set([cls.tag])
+        cls.item = RecipeIngredients.objects.create(
+            recipe=cls.recipe, amount=100,
+            ingredient=Ingredient.objects.create(
+                name='Овсянка', measurement_unit='г'
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def in_other_process(self):
+        return mock.patch('api.cache.cache', LocMemCache('other', {}))
+
+    def test_recipe_edit(self):
+        self.assertEqual(self.client.get(self.url).data['name'], 'Каша')
+        with self.in_other_process():
+            recipe = Recipe.objects.get(pk=self.recipe.pk)
+            recipe.name = 'Овсяная каша'
+            recipe.save()
+        self.assertEqual(
+            self.client.get(self.url).data['name'], 'Овсяная каша'
+        )
+
+    def test_related_edits(self):
+        self.client.get('/api/recipes/')
+        with self.in_other_process():
+            self.item.amount = 200
+            self.item.save()
+            self.tag.name = 'Утро'
+            self.tag.save()
+        data = self.client.get('/api/recipes/').data['results'][0]
+        self.assertEqual(data['ingredients'][0]['amount'], 200)
+        self.assertEqual(data['tags'][0]['name'], 'Утро')
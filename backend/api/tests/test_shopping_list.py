@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+
+User = get_user_model()
+
+
+class ShoppingListCacheTests(TestCase):
+    """Файл списка покупок не отдаётся из кеша после изменения корзины в
+    другом процессе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='buyer@example.com', username='buyer',
+            first_name='Buyer', last_name='Buyer', password='password'
+        )
+        cls.recipes = []
+        for name in ('Мука', 'Сахар'):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт: {name}', text='Описание',
+                cooking_time=10, image='static/recipe/test.png'
+            )
+            RecipeIngredients.objects.create(
+                recipe=recipe, amount=100,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit='г'
+                )
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_cart_change_in_other_process(self):
+        first, second = self.recipes
+        self.client.post(f'/api/recipes/{first.id}/shopping_cart/')
+        self.assertNotIn('Сахар', self.download())
+
+        other_process = LocMemCache('other-process', {})
+        with mock.patch('api.shopping_list.cache', other_process):
+            response = self.client.post(
+                f'/api/recipes/{second.id}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+        self.assertIn('Сахар', self.download())
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Subscribe
+
+User = get_user_model()
+
+
+class RecipesLimitTests(TestCase):
+    """recipes_limit принимает только положительные числа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='password'
+        )
+        cls.author, cls.other = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Author', last_name=str(i), password='password'
+            )
+            for i in range(2)
+        ]
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10, image='static/recipe/test.png'
+            )
+        Subscribe.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_subscriptions_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['recipes']), 2)
+
+    def test_invalid_limit(self):
+        for limit in ('abc', '-1', '0'):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/', {'recipes_limit': limit}
+                )
+                self.assertEqual(response.status_code, 400)
+                response = self.client.post(
+                    f'/api/users/{self.other.id}/subscribe/'
+                    f'?recipes_limit={limit}'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Subscribe.objects.filter(user=self.user, author=self.other)
+            .exists()
+        )
@@ -1,7 +1,9 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UsersViewSet
+from .views import (ImageUploadViewSet, IngredientViewSet, RecipeViewSet,
+                    TagViewSet, UsersViewSet)
 
 app_name = 'api'
 
@@ -10,9 +12,68 @@ router_v1.register('users', UsersViewSet, basename='users')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
+router_v1.register('uploads', ImageUploadViewSet, basename='uploads')
 
+urlpatterns = []
 
-urlpatterns = [
+if settings.SERVER_MODE == 'asgi':
+    from .async_views import async_viewset_view
+
+    DETAIL_ACTIONS = {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }
+    urlpatterns += [
+        path(
+            'recipes/download_shopping_cart/',
+            async_viewset_view(
+                RecipeViewSet, {'get': 'download_shopping_cart'},
+                basename='recipes', detail=False,
+                **RecipeViewSet.download_shopping_cart.kwargs
+            ),
+            name='recipes-download-shopping-cart',
+        ),
+        path(
+            'recipes/',
+            async_viewset_view(
+                RecipeViewSet, {'get': 'list', 'post': 'create'},
+                basename='recipes', detail=False
+            ),
+            name='recipes-list',
+        ),
+        re_path(
+            r'^recipes/(?P<pk>\d+)/$',
+            async_viewset_view(
+                RecipeViewSet, DETAIL_ACTIONS,
+                basename='recipes', detail=True
+            ),
+            name='recipes-detail',
+        ),
+    ]
+    for prefix, viewset in (
+        ('tags', TagViewSet),
+        ('ingredients', IngredientViewSet),
+    ):
+        urlpatterns += [
+            path(
+                f'{prefix}/',
+                async_viewset_view(
+                    viewset, {'get': 'list'}, basename=prefix, detail=False
+                ),
+                name=f'{prefix}-list',
+            ),
+            re_path(
+                rf'^{prefix}/(?P<pk>\d+)/$',
+                async_viewset_view(
+                    viewset, {'get': 'retrieve'}, basename=prefix, detail=True
+                ),
+                name=f'{prefix}-detail',
+            ),
+        ]
+
+urlpatterns += [
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,27 +1,42 @@
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.parsers import FileUploadParser, MultiPartParser
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import HTTP_400_BAD_REQUEST
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
 
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredients, ShoppingCart, Subscribe, Tag)
+from backend.constants import (FEED_MAX_PAGE_SIZE, FEED_PAGE_SIZE,
+                               PANTRY_MAX_INGREDIENTS, PANTRY_MAX_RESULTS,
+                               PANTRY_RESULTS_COUNT, SIMILAR_RECIPES_COUNT)
+from recipes.feed import get_feed_ids
+from recipes.pantry import rank_by_pantry
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            SimilarRecipe, Subscribe, Tag)
 
+from .catalog import CatalogListMixin
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import CustomPagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (IngredientSerializer, RecipeReadSerializer,
-                          RecipeShortSerializer, RecipeWriteSerializer,
-                          SubscribeSerializer, TagSerializer, UsersSerializer)
+from .renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer)
+from .serializers import (ImageUploadSerializer, IngredientSerializer,
+                          PantryRecipeSerializer, RecipeReadSerializer,
+                          RecipeShortSerializer,
+                          RecipeWriteSerializer, SubscribeSerializer,
+                          TagSerializer, UsersSerializer, get_recipes_limit)
+from .shopping_list import iter_shopping_list
 
 User = get_user_model()
 
@@ -49,6 +64,7 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data,
@@ -56,6 +72,11 @@ class RecipeViewSet(ModelViewSet):
             headers=headers
         )
 
+    def get_queryset(self):
+        return Recipe.objects.with_user_flags(
+            self.request.user
+        ).defer('search_vector')
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
@@ -92,7 +113,8 @@ class RecipeViewSet(ModelViewSet):
                 {'errors': 'Рецепт уже добавлен в корзину!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        model.objects.create(user=user, recipe=recipe)
+        with transaction.atomic():
+            model.objects.create(user=user, recipe=recipe)
         serializer = RecipeShortSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -103,43 +125,140 @@ class RecipeViewSet(ModelViewSet):
 
     @action(
         detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ]
     )
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopping_cart.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        def get_user_shopping_cart_ingredients():
-            return RecipeIngredients.objects.filter(
-                recipe__shopping_cart__user=request.user
-            ).values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            iter_shopping_list(user, renderer),
+            content_type=content_type
+        )
+        name = f'shopping_list_for_{user.username}.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={name}'
+        return response
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми.
 
-        def aggregate_ingredient_amount(ingredients):
-            return ingredients.annotate(amount=Sum('amount'))
+        Следующая страница запрашивается параметром before с id последнего
+        рецепта страницы (ссылка next).
+        """
+        try:
+            limit = int(request.query_params.get('limit', FEED_PAGE_SIZE))
+            before = request.query_params.get('before')
+            before = int(before) if before is not None else None
+        except ValueError:
+            raise ValidationError(
+                {'error': 'Параметры limit и before должны быть числами.'}
+            )
+        limit = max(1, min(limit, FEED_MAX_PAGE_SIZE))
 
-        def format_ingredient_line(ingredient):
-            return (
-                f'- {ingredient["ingredient__name"]}'
-                f'({ingredient["ingredient__measurement_unit"]})'
-                f'- {ingredient["amount"]}'
+        ids = get_feed_ids(request.user, before, limit + 1)
+        has_next = len(ids) > limit
+        ids = ids[:limit]
+        recipes = self.get_queryset().filter(pk__in=ids).order_by('-id')
+        serializer = self.get_serializer(recipes, many=True)
+        next_url = None
+        if has_next:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', ids[-1]
             )
+        return Response({'next': next_url, 'results': serializer.data})
 
-        user_ingredients = get_user_shopping_cart_ingredients()
-        agg_ing = aggregate_ingredient_amount(user_ingredients)
-        name = f'shopping_list_for_{user.get_username}.txt'
-        shopping_list = f'Что купить для {user.get_username()}:\n'
-        shopping_list += '\n'.join(
-            [format_ingredient_line(ingredient) for ingredient in agg_ing]
+    @action(detail=True, permission_classes=[AllowAny])
+    def similar(self, request, pk):
+        """Похожие рецепты по общим ингредиентам и тегам.
+
+        Списки пересчитываются командой rebuild_similar, поэтому после
+        правки рецепта они обновляются с задержкой.
+        """
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        try:
+            limit = int(
+                request.query_params.get('limit', SIMILAR_RECIPES_COUNT)
+            )
+        except ValueError:
+            raise ValidationError(
+                {'error': 'Параметр limit должен быть числом.'}
+            )
+        limit = max(1, min(limit, SIMILAR_RECIPES_COUNT))
+        ids = list(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('similar_id', flat=True)[:limit])
+        recipes = Recipe.objects.only(
+            'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk(ids)
+        serializer = RecipeShortSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context={'request': request}
         )
+        return Response(serializer.data)
 
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={name}'
+    @action(detail=False, permission_classes=[AllowAny])
+    def pantry(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов.
 
-        return response
+        Ингредиенты передаются параметрами ingredients (id, можно через
+        запятую), рецепты сортируются по доле имеющихся ингредиентов.
+        Работают фильтры списка рецептов, в том числе tags и cooking_time.
+        """
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value.strip()
+            }
+            limit = int(
+                request.query_params.get('limit', PANTRY_RESULTS_COUNT)
+            )
+        except ValueError:
+            raise ValidationError(
+                {'error': 'Параметры ingredients и limit должны быть '
+                          'числами.'}
+            )
+        if not ingredient_ids:
+            raise ValidationError(
+                {'error': 'Укажите имеющиеся ингредиенты в ingredients.'}
+            )
+        if len(ingredient_ids) > PANTRY_MAX_INGREDIENTS:
+            raise ValidationError(
+                {'error': f'Не более {PANTRY_MAX_INGREDIENTS} ингредиентов.'}
+            )
+        limit = max(1, min(limit, PANTRY_MAX_RESULTS))
+
+        queryset = self.filter_queryset(
+            Recipe.objects.with_user_flags(request.user)
+        )
+        ranked = rank_by_pantry(queryset, ingredient_ids, limit)
+        recipes = Recipe.objects.only(
+            'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk([pk for pk, _, _ in ranked])
+        results = []
+        for pk, matched, total in ranked:
+            recipe = recipes.get(pk)
+            if recipe is not None:
+                recipe.matched_count = matched
+                recipe.ingredients_count = total
+                recipe.coverage = round(matched / total, 4)
+                results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
 
 
 class UsersViewSet(UserViewSet):
@@ -167,7 +286,8 @@ class UsersViewSet(UserViewSet):
             )
             try:
                 serializer.is_valid(raise_exception=True)
-                Subscribe.objects.create(user=user, author=author)
+                with transaction.atomic():
+                    Subscribe.objects.create(user=user, author=author)
                 return Response(
                     serializer.data,
                     status=status.HTTP_201_CREATED
@@ -193,29 +313,56 @@ class UsersViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(subscribing__user=user)
+        limit = get_recipes_limit(request)
+        queryset = User.objects.filter(subscribing__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         pages = self.paginate_queryset(queryset)
+        recipes = Recipe.objects.latest_by_author(
+            [author.id for author in pages], limit
+        )
         serializer = SubscribeSerializer(
             pages,
             many=True,
-            context={'request': request}
+            context={'request': request, 'recipes': recipes}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogListMixin, ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    search_fields = ['^name', ]
     filter_backends = [IngredientFilter, ]
+    catalog_name = 'ingredients'
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogListMixin, ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
     queryset = Tag.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
     pagination_class = None
+    catalog_name = 'tags'
+
+
+class ImageUploadViewSet(CreateModelMixin, GenericViewSet):
+    """Вьюсет для загрузки изображения рецепта отдельным запросом.
+
+    Принимает multipart/form-data с полем image или файл в теле запроса
+    с заголовком Content-Disposition, возвращает токен загрузки.
+    """
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser, FileUploadParser)
+
+    def get_serializer(self, *args, **kwargs):
+        data = kwargs.get('data')
+        if data is not None and 'image' not in data and 'file' in data:
+            kwargs['data'] = {'image': data['file']}
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
@@ -1,3 +1,51 @@
 MIN_VALUE = 1
 
 MAX_VALUE = 32000
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'list': (480, 480),
+    'detail': (1024, 1024),
+}
+
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+IMAGE_UPLOAD_TTL = 60 * 60 * 24
+
+IMAGE_UPLOAD_CLEANUP_INTERVAL = 60 * 10
+
+TAG_MASK_BITS = 63
+
+FEED_TIMELINE_LENGTH = 500
+
+FEED_FANOUT_LIMIT = 1000
+
+FEED_TRIM_INTERVAL = 50
+
+FEED_PAGE_SIZE = 6
+
+FEED_MAX_PAGE_SIZE = 100
+
+SIMILAR_RECIPES_COUNT = 10
+
+SIMILAR_INGREDIENT_WEIGHT = 0.8
+
+SIMILAR_TAG_WEIGHT = 0.2
+
+SIMILAR_MAX_POSTING = 5000
+
+PANTRY_MAX_INGREDIENTS = 100
+
+PANTRY_RESULTS_COUNT = 20
+
+PANTRY_MAX_RESULTS = 100
+
+PANTRY_QUERY_BATCH = 10000
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionPool:
+    """Пул соединений процесса с ограничением размера и ожиданием.
+
+    Простаивавшее дольше health_check_interval соединение перед выдачей
+    проверяется функцией check, неработающие соединения закрываются.
+    """
+
+    def __init__(self, connect, check, close, max_size=10, timeout=10.0,
+                 health_check_interval=30.0):
+        self.connect = connect
+        self.check = check
+        self.close = close
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'created': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'in_use': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.stats['timeouts'] += 1
+            raise PoolTimeout(
+                f'Нет свободных соединений за {self.timeout} с '
+                f'(максимум {self.max_size})'
+            )
+        waited = time.monotonic() - start
+        with self.lock:
+            self.stats['acquired'] += 1
+            self.stats['in_use'] += 1
+            self.stats['wait_seconds_total'] += waited
+            self.stats['wait_seconds_max'] = max(
+                self.stats['wait_seconds_max'], waited
+            )
+        try:
+            return self.get_connection()
+        except BaseException:
+            self.free_slot()
+            raise
+
+    def get_connection(self):
+        while True:
+            with self.lock:
+                item = self.idle.pop() if self.idle else None
+            if item is None:
+                connection = self.connect()
+                with self.lock:
+                    self.stats['created'] += 1
+                return connection
+            connection, released_at = item
+            idle_for = time.monotonic() - released_at
+            if idle_for < self.health_check_interval or self.check(connection):
+                return connection
+            self.discard(connection)
+
+    def release(self, connection, reusable=True):
+        try:
+            if reusable:
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+        finally:
+            self.free_slot()
+
+    def free_slot(self):
+        with self.lock:
+            self.stats['in_use'] -= 1
+        self.slots.release()
+
+    def discard(self, connection):
+        with self.lock:
+            self.stats['discarded'] += 1
+        try:
+            self.close(connection)
+        except Exception:
+            pass
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.stats,
+                'idle': len(self.idle),
+                'max_size': self.max_size,
+                'utilization': self.stats['in_use'] / self.max_size,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Возвращает пул для базы alias в текущем процессе, создавая его
+    через factory() при первом обращении."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = factory()
+        return _pools[key]
+
+
+def pool_stats():
+    """Метрики всех пулов текущего процесса по имени базы."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = {
+            alias: pool for (alias, pool_pid), pool in _pools.items()
+            if pool_pid == pid
+        }
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
@@ -0,0 +1,64 @@
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from backend.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = base.Database
+
+
+def check_connection(connection):
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    Настройки пула задаются ключом POOL в DATABASES: MAX_SIZE, TIMEOUT
+    (ожидание свободного соединения, с) и HEALTH_CHECK_INTERVAL (с).
+    """
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        parent = super()
+
+        def factory():
+            return ConnectionPool(
+                connect=lambda: parent.get_new_connection(conn_params),
+                check=check_connection,
+                close=lambda connection: connection.close(),
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10.0),
+                health_check_interval=options.get(
+                    'HEALTH_CHECK_INTERVAL', 30.0
+                ),
+            )
+
+        return get_pool(self.alias, factory)
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        reusable = not connection.closed
+        if reusable:
+            try:
+                status = connection.get_transaction_status()
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Database.Error:
+                reusable = False
+        self.pool.release(connection, reusable=reusable)
@@ -11,7 +11,10 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'empty')
 
 DEBUG = str(os.getenv('DEBUG', True)).lower() == 'true'
 
-ALLOWED_HOSTS = ['127.0.0.1', 'foodgrabber.ddns.net', '84.201.139.121', 'localhost']
+ALLOWED_HOSTS = [
+    '127.0.0.1', 'foodgrabber.ddns.net', '84.201.139.121', 'localhost',
+    'backend',
+]
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -30,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,18 +62,69 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# wsgi или asgi; в режиме asgi горячие эндпоинты чтения обслуживаются
+# асинхронными представлениями, а работа с БД идёт в пуле из
+# ASYNC_DB_THREADS потоков (не больше размера пула соединений с БД).
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 8))
+
+# Заголовок Server-Timing с временем ответа, SQL и сериализации.
+SERVER_TIMING = str(os.getenv('SERVER_TIMING', False)).lower() == 'true'
+
+if os.getenv('DB_ENGINE', 'postgresql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    DB_POOL = str(os.getenv('DB_POOL', False)).lower() == 'true'
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'backend.db.postgresql' if DB_POOL
+                else 'django.db.backends.postgresql'
+            ),
+            'NAME': os.getenv('POSTGRES_DB', 'postgres'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432),
+            # С пулом соединение возвращается в пул в конце запроса,
+            # без пула оно остаётся открытым CONN_MAX_AGE секунд.
+            'CONN_MAX_AGE': (
+                0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60))
+            ),
+            'POOL': {
+                'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                'HEALTH_CHECK_INTERVAL': float(
+                    os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30)
+                ),
+            },
+        }
+    }
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'postgres'),
-        'USER': os.getenv('POSTGRES_USER', 'postgres'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+TOKEN_AUTH_CACHE = {
+    'LOCAL_SIZE': 10000,
+    'LOCAL_TTL': int(os.getenv('TOKEN_CACHE_LOCAL_TTL', 30)),
+    'SHARED_ALIAS': os.getenv('TOKEN_CACHE_SHARED_ALIAS') or None,
+    'SHARED_TTL': 300,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,12 +161,17 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 }
 
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 AUTH_USER_MODEL = 'users.User'
 TEST_EMAIL = 'Testforrest2023@gmail.com'
 
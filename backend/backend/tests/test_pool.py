@@ -0,0 +1,151 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from backend.db import pool as pool_module
+from backend.db.pool import ConnectionPool, PoolTimeout, get_pool, pool_stats
+
+
+class FakeConnection:
+
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+
+
+class FakeBackend:
+    """Фабрика соединений для пула без PostgreSQL."""
+
+    def __init__(self):
+        self.created = []
+        self.checked = []
+
+    def connect(self):
+        connection = FakeConnection(len(self.created))
+        self.created.append(connection)
+        return connection
+
+    def check(self, connection):
+        self.checked.append(connection)
+        return connection.alive
+
+    def close(self, connection):
+        connection.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        self.backend = FakeBackend()
+        kwargs.setdefault('max_size', 2)
+        kwargs.setdefault('timeout', 0.05)
+        return ConnectionPool(
+            self.backend.connect, self.backend.check, self.backend.close,
+            **kwargs
+        )
+
+    def test_released_connection_is_reused(self):
+        pool = self.make_pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.backend.created), 1)
+
+    def test_acquire_waits_for_release(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, (connection,))
+        timer.start()
+        try:
+            self.assertIs(pool.acquire(), connection)
+        finally:
+            timer.join()
+        self.assertGreater(pool.snapshot()['wait_seconds_max'], 0)
+
+    def test_timeout_when_pool_is_exhausted(self):
+        pool = self.make_pool()
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.snapshot()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 2)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(max_size=1)
+        with mock.patch.object(pool, 'connect', side_effect=OSError):
+            with self.assertRaises(OSError):
+                pool.acquire()
+        self.assertEqual(pool.snapshot()['in_use'], 0)
+        pool.acquire()
+
+    def test_stale_idle_connection_is_checked(self):
+        pool = self.make_pool(health_check_interval=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(self.backend.checked, [connection])
+
+    def test_recently_released_connection_is_not_checked(self):
+        pool = self.make_pool(health_check_interval=60)
+        pool.release(pool.acquire())
+        pool.acquire()
+        self.assertEqual(self.backend.checked, [])
+
+    def test_broken_connection_is_discarded(self):
+        pool = self.make_pool(health_check_interval=0)
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.alive = False
+        connection = pool.acquire()
+        self.assertIsNot(connection, broken)
+        self.assertTrue(broken.closed)
+        stats = pool.snapshot()
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['created'], 2)
+
+    def test_release_not_reusable_closes_connection(self):
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection, reusable=False)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.snapshot()['idle'], 0)
+
+    def test_snapshot(self):
+        pool = self.make_pool(max_size=4)
+        first = pool.acquire()
+        pool.acquire()
+        pool.release(first)
+        stats = pool.snapshot()
+        self.assertEqual(stats['acquired'], 2)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['max_size'], 4)
+        self.assertEqual(stats['utilization'], 0.25)
+
+
+class PoolRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(pool_module, '_pools', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_one_pool_per_alias(self):
+        backend = FakeBackend()
+
+        def factory():
+            return ConnectionPool(
+                backend.connect, backend.check, backend.close, max_size=3
+            )
+
+        pool = get_pool('default', factory)
+        self.assertIs(get_pool('default', factory), pool)
+        pool.acquire()
+        stats = pool_stats()
+        self.assertEqual(list(stats), ['default'])
+        self.assertEqual(stats['default']['in_use'], 1)
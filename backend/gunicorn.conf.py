@@ -0,0 +1,14 @@
+import os
+
+# SERVER_MODE=asgi запускает приложение backend.asgi на воркерах uvicorn,
+# по умолчанию используется синхронный backend.wsgi.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0:7000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'
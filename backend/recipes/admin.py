@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.admin import display
 
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredients,
-                     ShoppingCart, Subscribe, Tag)
+                     ShoppingCart, ShoppingListItem, Subscribe, Tag)
 
 
 @admin.register(Ingredient)
@@ -15,7 +15,7 @@ class IngredientAdmin(admin.ModelAdmin):
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """Админка для тегов."""
-    list_display = ('name', 'color', 'slug',)
+    list_display = ('name', 'color', 'slug', 'bit',)
 
 
 @admin.register(Recipe)
@@ -25,9 +25,12 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('added_in_favorites',)
     list_filter = ('author', 'name', 'tags',)
 
-    @display(description='Количество в избранных')
+    @display(
+        description='Количество в избранных',
+        ordering='favorites_count'
+    )
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(RecipeIngredients)
@@ -52,3 +55,10 @@ class SubscribeAdmin(admin.ModelAdmin):
 class ShoppingCartAdmin(admin.ModelAdmin):
     """Админка для корзины покупок."""
     list_display = ('user', 'recipe',)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Админка для списков покупок."""
+    list_display = ('user', 'ingredient', 'amount',)
+    list_filter = ('user',)
@@ -0,0 +1,87 @@
+from collections import defaultdict
+
+from django.db.models import F, Sum
+
+from .models import RecipeIngredients, ShoppingCart, ShoppingListItem
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавляет изменения количеств ингредиентов к спискам покупок.
+
+    deltas — словарь {ingredient_id: изменение количества}. Недостающие
+    строки создаются с нулём, затем все строки обновляются через F(),
+    поэтому конкурентные изменения не теряются.
+    """
+    user_ids = list(user_ids)
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id in deltas
+        ],
+        ignore_conflicts=True
+    )
+    by_delta = defaultdict(list)
+    for ingredient_id, delta in deltas.items():
+        by_delta[delta].append(ingredient_id)
+    for delta, ingredient_ids in by_delta.items():
+        ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=ingredient_ids
+        ).update(amount=F('amount') + delta)
+    ShoppingListItem.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=deltas,
+        amount__lte=0
+    ).delete()
+
+
+def get_recipe_amounts(recipe_id):
+    amounts = defaultdict(int)
+    rows = RecipeIngredients.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount')
+    for ingredient_id, amount in rows:
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def change_cart(user_id, recipe_id, sign):
+    """Добавляет (sign=1) или убирает (sign=-1) рецепт из списка покупок."""
+    apply_deltas(
+        [user_id],
+        {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+        }
+    )
+
+
+def change_recipe_ingredients(recipe_id, deltas):
+    """Применяет изменения ингредиентов рецепта ко всем корзинам с ним."""
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def compute_shopping_lists(user_ids=None):
+    """Считает списки покупок с нуля по корзинам и ингредиентам рецептов."""
+    rows = RecipeIngredients.objects.filter(
+        recipe__shopping_cart__isnull=False
+    )
+    if user_ids is not None:
+        rows = rows.filter(recipe__shopping_cart__user_id__in=user_ids)
+    rows = rows.values(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    return {
+        (row['recipe__shopping_cart__user_id'], row['ingredient_id']):
+            row['total']
+        for row in rows
+    }
@@ -0,0 +1,114 @@
+from django.db import connection, transaction
+
+from backend.constants import (FEED_FANOUT_LIMIT, FEED_TIMELINE_LENGTH,
+                               FEED_TRIM_INTERVAL)
+
+from .models import Recipe, Subscribe, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def trim_timelines(user_ids, length=FEED_TIMELINE_LENGTH):
+    """Оставляет в лентах пользователей только length новейших рецептов.
+
+    Все ленты обрезаются одним запросом с ROW_NUMBER() OVER
+    (PARTITION BY user_id).
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ('
+            f'SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY user_id ORDER BY recipe_id DESC'
+            f') AS position FROM {table} '
+            f'WHERE user_id IN ({placeholders})'
+            f') AS ranked WHERE position > %s)',
+            [*user_ids, length]
+        )
+
+
+def push_to_timelines(recipe_id):
+    """Добавляет рецепт в ленты подписчиков автора (fan-out on write).
+
+    Рецепты авторов с числом подписчиков больше FEED_FANOUT_LIMIT не
+    рассылаются и читаются из подписок при запросе ленты. Каждая лента
+    обрезается в среднем раз в FEED_TRIM_INTERVAL добавлений, так что её
+    длина не превышает FEED_TIMELINE_LENGTH намного.
+    """
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None or recipe.author is None:
+        return
+    if recipe.author.subscribers_count > FEED_FANOUT_LIMIT:
+        return
+    follower_ids = list(Subscribe.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True))
+    with transaction.atomic():
+        for start in range(0, len(follower_ids), BATCH_SIZE):
+            batch = follower_ids[start:start + BATCH_SIZE]
+            TimelineEntry.objects.bulk_create(
+                (
+                    TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in batch
+                ),
+                ignore_conflicts=True
+            )
+            trim_timelines(
+                user_id for user_id in batch
+                if (user_id + recipe_id) % FEED_TRIM_INTERVAL == 0
+            )
+        Recipe.objects.filter(pk=recipe_id).update(in_timelines=True)
+
+
+def schedule_push(recipe_id):
+    transaction.on_commit(lambda: push_to_timelines(recipe_id))
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту новые подписки последние рецепты автора."""
+    recipe_ids = Recipe.objects.filter(author_id=author_id).order_by(
+        '-id'
+    ).values_list('pk', flat=True)[:FEED_TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True
+    )
+    trim_timelines([user_id])
+
+
+def remove_from_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def get_feed_ids(user, before=None, limit=FEED_TIMELINE_LENGTH):
+    """Id рецептов ленты пользователя по убыванию, не больше limit.
+
+    Разосланные рецепты берутся из ленты, остальные (авторов с большим
+    числом подписчиков и опубликованные до появления лент) — из подписок.
+    Оба запроса идут по индексу и ограничены limit.
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    unpushed = Recipe.objects.filter(
+        in_timelines=False,
+        author__in=Subscribe.objects.filter(user=user).values('author')
+    )
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+        unpushed = unpushed.filter(pk__lt=before)
+    ids = set(entries.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True
+    )[:limit])
+    ids.update(unpushed.order_by('-id').values_list('pk', flat=True)[:limit])
+    return sorted(ids, reverse=True)[:limit]
@@ -0,0 +1,94 @@
+import io
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from backend.constants import IMAGE_UPLOAD_TTL, RECIPE_IMAGE_VARIANTS
+
+from .models import ImageUpload, Recipe
+
+VARIANTS_DIR = 'static/recipe/variants'
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+
+
+def build_variants(recipe):
+    """Сохраняет уменьшенные JPEG и WebP копии изображения рецепта.
+
+    Возвращает словарь {вариант: {формат: путь в хранилище}}.
+    """
+    with recipe.image.open('rb') as file:
+        original = Image.open(file)
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', original.size, 'white')
+        background.paste(original, mask=original.convert('RGBA'))
+        original = background
+    original = original.convert('RGB')
+
+    variants = {}
+    for name, size in RECIPE_IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        variants[name] = {}
+        for extension, options in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            path = f'{VARIANTS_DIR}/{recipe.pk}/{name}.{extension}'
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            path = default_storage.save(path, ContentFile(buffer.getvalue()))
+            variants[name][extension] = path
+    return variants
+
+
+def accepts_webp(request):
+    return request is not None and 'image/webp' in request.META.get(
+        'HTTP_ACCEPT', ''
+    )
+
+
+def image_url(name, variants, variant, webp=False):
+    """URL подходящего варианта изображения или оригинала, пока варианты
+    ещё не готовы."""
+    paths = (variants or {}).get(variant)
+    if paths:
+        return default_storage.url(paths['webp' if webp else 'jpeg'])
+    if name:
+        return default_storage.url(name)
+    return None
+
+
+def delete_expired_uploads(batch_size=100):
+    """Удаляет неиспользованные загрузки старше IMAGE_UPLOAD_TTL вместе
+    с файлами. Возвращает число удалённых загрузок.
+
+    Загрузка удаляется с запасом в час после истечения срока, чтобы не
+    помешать рецепту, который принял её токен перед самым истечением.
+    Файл, уже ставший изображением рецепта, не удаляется.
+    """
+    expired = ImageUpload.objects.filter(
+        created_at__lt=timezone.now() - timedelta(
+            seconds=IMAGE_UPLOAD_TTL + 60 * 60
+        )
+    ).order_by('id')
+    deleted = 0
+    while True:
+        batch = list(expired[:batch_size])
+        if not batch:
+            return deleted
+        used = set(Recipe.objects.filter(
+            image__in=[upload.image.name for upload in batch]
+        ).values_list('image', flat=True))
+        for upload in batch:
+            if upload.image.name and upload.image.name not in used:
+                upload.image.delete(save=False)
+        ImageUpload.objects.filter(
+            pk__in=[upload.pk for upload in batch]
+        ).delete()
+        deleted += len(batch)
@@ -0,0 +1,132 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import FavoriteRecipe, Recipe, Tag
+from recipes.tags import filter_by_tags, update_tag_masks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает фильтрацию рецептов по тегам через соединение с '
+        'тегами и по маске на синтетических данных. Данные откатываются '
+        'после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=12)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        with transaction.atomic():
+            user = User.objects.create(
+                username='bench_tags', email='bench_tags@example.com'
+            )
+            tags = [
+                Tag.objects.create(
+                    name=f'bench tag {i}',
+                    color=f'#BE{i:04X}',
+                    slug=f'bench-tag-{i}'
+                )
+                for i in range(options['tags'])
+            ]
+            start = Recipe.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            ).first() or 0
+            Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        author=user,
+                        name=f'Рецепт {i}',
+                        text='Описание',
+                        cooking_time=10,
+                        image='static/recipe/bench.png',
+                    )
+                    for i in range(options['recipes'])
+                ),
+                batch_size=5000
+            )
+            recipe_ids = list(Recipe.objects.filter(
+                pk__gt=start
+            ).values_list('pk', flat=True))
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.pk)
+                    for recipe_id in recipe_ids
+                    for tag in rnd.sample(tags, rnd.randint(1, 3))
+                ),
+                batch_size=5000
+            )
+            FavoriteRecipe.objects.bulk_create(
+                (
+                    FavoriteRecipe(user=user, recipe_id=recipe_id)
+                    for recipe_id in rnd.sample(
+                        recipe_ids, len(recipe_ids) // 10
+                    )
+                ),
+                batch_size=5000
+            )
+            update_tag_masks(recipe_ids)
+
+            queries = [
+                rnd.sample(tags, rnd.randint(1, 3))
+                for _ in range(options['queries'])
+            ]
+            recipes = Recipe.objects.filter(author=user)
+            favorites = recipes.filter(favorites__user=user)
+            self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+            for name, base in (('все', recipes), ('избранное', favorites)):
+                for match_all in (False, True):
+                    mode = 'все теги' if match_all else 'любой тег'
+                    self.compare(
+                        f'{name}, {mode}', base, queries, match_all,
+                        options['page_size']
+                    )
+            # Для маски нет индекса: план показывает полный просмотр
+            # рецептов с проверкой маски в каждой строке.
+            self.stdout.write('План фильтра по маске:')
+            self.stdout.write(
+                filter_by_tags(
+                    Recipe.objects.all(), queries[0], False
+                ).explain()
+            )
+            transaction.set_rollback(True)
+
+    def join_filter(self, queryset, tags, match_all):
+        if match_all:
+            for tag in tags:
+                queryset = queryset.filter(tags__slug=tag.slug)
+            return queryset
+        return queryset.filter(
+            tags__slug__in=[tag.slug for tag in tags]
+        ).distinct()
+
+    def compare(self, name, base, queries, match_all, page_size):
+        for method, apply in (
+            ('соединение', self.join_filter),
+            ('маска', filter_by_tags),
+        ):
+            timings = []
+            for tags in queries:
+                start = time.perf_counter()
+                queryset = apply(base, tags, match_all)
+                queryset.count()
+                list(queryset.order_by('-id')[:page_size])
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f'{name}, {method}: среднее '
+                f'{statistics.mean(timings) * 1000:.2f} мс, '
+                f'p95 {p95 * 1000:.2f} мс'
+            )
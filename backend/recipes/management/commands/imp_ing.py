@@ -1,26 +1,102 @@
 import csv
+import json
+from itertools import islice
+from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
+from api.catalog import bump_catalog_version
 from recipes.models import Ingredient
 
+DEFAULT_FILE = Path(__file__).resolve().parent / 'ingredients.json'
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def iter_json(file):
+    """Построчно разбирает JSON-массив объектов, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('Ожидался JSON-массив')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            yield item['name'], item['measurement_unit']
+        buffer = buffer[position:]
+    # Файл закончился до закрывающей скобки: в буфере остался
+    # неразобранный элемент либо массив оборван.
+    raise ValueError(
+        f'Некорректный JSON-массив: {buffer.strip()[:100]!r}'
+        if buffer.strip() else 'JSON-массив не закрыт'
+    )
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла пакетами.'
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='Путь к CSV файлу')
+        parser.add_argument(
+            'file_path',
+            type=str,
+            nargs='?',
+            default=str(DEFAULT_FILE),
+            help='Путь к CSV или JSON файлу'
+        )
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество ингредиентов в одном INSERT'
+        )
+        parser.add_argument(
+            '--skip-existing',
+            action='store_true',
+            help='Пропускать ингредиенты с уже существующими '
+                 'названием и единицей измерения'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
+        file_format = options['format'] or Path(file_path).suffix.lstrip('.')
+        readers = {'csv': iter_csv, 'json': iter_json}
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {file_path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным')
 
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    name, measurement_unit = row[:2]
-                    Ingredient.objects.create(
-                        name=name,
-                        measurement_unit=measurement_unit
+                with transaction.atomic():
+                    created = self.load(
+                        readers[file_format](file),
+                        options['batch_size'],
+                        options['skip_existing']
                     )
         except FileNotFoundError:
             self.stderr.write(self.style.ERROR(f'Файл не найден: {file_path}'))
@@ -31,4 +107,30 @@ class Command(BaseCommand):
             ))
             return
 
-        self.stdout.write(self.style.SUCCESS('Загрузка успешна'))
+        bump_catalog_version('ingredients')
+        self.stdout.write(
+            self.style.SUCCESS(f'Загрузка успешна: {created} ингредиентов')
+        )
+
+    def load(self, rows, batch_size, skip_existing):
+        seen = set()
+        if skip_existing:
+            seen.update(
+                Ingredient.objects.values_list('name', 'measurement_unit')
+            )
+        created = 0
+        while True:
+            batch = []
+            for row in islice(rows, batch_size):
+                if skip_existing:
+                    if row in seen:
+                        continue
+                    seen.add(row)
+                batch.append(
+                    Ingredient(name=row[0], measurement_unit=row[1])
+                )
+            if not batch:
+                return created
+            Ingredient.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            self.stdout.write(f'Загружено: {created}')
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from backend.constants import IMAGE_UPLOAD_CLEANUP_INTERVAL
+from recipes.images import build_variants, delete_expired_uploads
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Фоновая обработка изображений рецептов: уменьшенные копии '
+        'для списка, страницы рецепта и миниатюры в JPEG и WebP. '
+        'Заодно удаляет просроченные неиспользованные загрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя новые изображения'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Пауза между проверками в секундах'
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        cleaned_at = None
+        while True:
+            if (cleaned_at is None or time.monotonic() - cleaned_at
+                    >= IMAGE_UPLOAD_CLEANUP_INTERVAL):
+                deleted = delete_expired_uploads()
+                cleaned_at = time.monotonic()
+                if deleted:
+                    self.stdout.write(f'Удалено загрузок: {deleted}')
+            processed = self.process_batch(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Обработано изображений: {processed}')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
+
+    def process_batch(self, batch_size):
+        pending = Recipe.objects.filter(
+            image_variants={}
+        ).exclude(image='').exclude(image=None).order_by('id')[:batch_size]
+        processed = 0
+        for recipe in pending:
+            name = recipe.image.name
+            try:
+                variants = build_variants(recipe)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(
+                    f'Не удалось обработать изображение {name}: {e}'
+                ))
+                variants = {'error': str(e)}
+            with transaction.atomic():
+                recipe = Recipe.objects.select_for_update().filter(
+                    pk=recipe.pk
+                ).first()
+                if recipe is None or recipe.image.name != name:
+                    continue
+                recipe.image_variants = variants
+                recipe.save(update_fields=['image_variants'])
+            processed += 1
+        return processed
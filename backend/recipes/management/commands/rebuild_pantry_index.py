@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from recipes.pantry import rebuild_pantry_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит заново списки рецептов по ингредиентам для подбора '
+        'рецептов по имеющимся продуктам.'
+    )
+
+    def handle(self, *args, **options):
+        postings = rebuild_pantry_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки рецептов построены для ингредиентов: {postings}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from recipes.search import create_search_index, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт GIN-индекс полнотекстового поиска и пересчитывает '
+        'поисковые векторы всех рецептов (только PostgreSQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        create_search_index(options['database'])
+        updated = update_search_vectors(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы пересчитаны: {updated}'
+        ))
@@ -0,0 +1,57 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cart import compute_shopping_lists
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает списки покупок из корзин или, с --check, сверяет '
+        'их с полным пересчётом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить списки покупок, ничего не меняя'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = compute_shopping_lists()
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingListItem.objects.filter(
+                    amount__gt=0
+                ).values_list('user_id', 'ingredient_id', 'amount')
+            }
+            mismatched = {
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            if options['check']:
+                if mismatched:
+                    raise CommandError(
+                        f'Расхождений в списках покупок: {len(mismatched)}'
+                    )
+                self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+                return
+
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for (user_id, ingredient_id), amount in expected.items()
+                ),
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено строк: {len(mismatched)}'
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.similar import rebuild_similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по пересечению ингредиентов и '
+        'тегов. По умолчанию обрабатываются только изменённые рецепты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать похожие для всех рецептов'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя изменённые рецепты'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Пауза между проверками в секундах'
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        index = None
+        while True:
+            start = time.perf_counter()
+            updated, index = rebuild_similar(index, full=full)
+            if updated:
+                self.stdout.write(
+                    f'Пересчитано рецептов: {updated} за '
+                    f'{time.perf_counter() - start:.1f} с'
+                )
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Tag
+from recipes.tags import update_tag_masks
+
+
+class Command(BaseCommand):
+    help = (
+        'Назначает биты тегам без них и пересчитывает маски тегов '
+        'всех рецептов.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for tag in Tag.objects.filter(bit=None).order_by('pk'):
+                tag.bit = Tag.free_bit()
+                if tag.bit is None:
+                    self.stderr.write(
+                        f'Свободных битов нет, тег {tag.slug} будет '
+                        f'фильтроваться без маски'
+                    )
+                    continue
+                tag.save(update_fields=['bit'])
+            updated = update_tag_masks()
+        self.stdout.write(self.style.SUCCESS(
+            f'Маски тегов пересчитаны: {updated}'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from recipes.feed import push_to_timelines
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает в ленты подписчиков рецепты, ещё не попавшие в них '
+        '(например, опубликованные до появления лент).'
+    )
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.filter(in_timelines=False).order_by(
+            'id'
+        ).values_list('pk', flat=True)
+        count = 0
+        for recipe_id in list(recipe_ids):
+            push_to_timelines(recipe_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {count}'
+        ))
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики рецептов и авторов.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_subquery(FavoriteRecipe, 'recipe'),
+                in_carts_count=count_subquery(ShoppingCart, 'recipe'),
+            )
+            users = User.objects.update(
+                recipes_count=count_subquery(Recipe, 'author'),
+                subscribers_count=count_subquery(Subscribe, 'author'),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: рецептов {recipes}, '
+            f'пользователей {users}'
+        ))
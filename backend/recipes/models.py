@@ -1,13 +1,93 @@
+import uuid
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connection, models
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              UniqueConstraint, Value)
 
-from backend.constants import MIN_VALUE, MAX_VALUE
+from backend.constants import MAX_VALUE, MIN_VALUE, TAG_MASK_BITS
 
 User = get_user_model()
 
 
+def recipe_related_lookups(user):
+    """Связи рецепта, подгружаемые заранее при его отображении."""
+    if user.is_anonymous:
+        authors = User.objects.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    else:
+        authors = User.objects.annotate(
+            is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('pk')
+            ))
+        )
+    return (
+        Prefetch('author', queryset=authors),
+        'tags',
+        Prefetch(
+            'ingredient_list',
+            queryset=RecipeIngredients.objects.select_related('ingredient')
+        ),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов."""
+
+    def with_user_flags(self, user):
+        """Аннотирует флаги избранного, корзины и подписки на автора."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                is_author_subscribed=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Возвращает {author_id: [рецепты]} с limit новейшими у каждого.
+
+        Все авторы обрабатываются одним запросом с ROW_NUMBER() OVER
+        (PARTITION BY author_id).
+        """
+        recipes = defaultdict(list)
+        author_ids = list(author_ids)
+        if not author_ids:
+            return recipes
+        if limit is None:
+            queryset = self.filter(author_id__in=author_ids).order_by('-id')
+        else:
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            placeholders = ', '.join(['%s'] * len(author_ids))
+            queryset = self.raw(
+                f'SELECT * FROM ('
+                f'SELECT {table}.*, ROW_NUMBER() OVER ('
+                f'PARTITION BY author_id ORDER BY id DESC'
+                f') AS author_row FROM {table} '
+                f'WHERE author_id IN ({placeholders})'
+                f') AS ranked WHERE author_row <= %s ORDER BY id DESC',
+                [*author_ids, limit]
+            )
+        for recipe in queryset:
+            recipes[recipe.author_id].append(recipe)
+        return recipes
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
     author = models.ForeignKey(
@@ -27,6 +107,12 @@ class Recipe(models.Model):
         blank=True,
         null=True
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         'Описание рецепта',
         max_length=1000
@@ -59,12 +145,99 @@ class Recipe(models.Model):
         blank=True,
         null=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Количество в избранных',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество в корзинах',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    tags_mask = models.BigIntegerField(
+        'Битовая маска тегов',
+        default=0,
+        editable=False
+    )
+    in_timelines = models.BooleanField(
+        'Разослан в ленты подписчиков',
+        default=False,
+        editable=False
+    )
+    similarity_stale = models.BooleanField(
+        'Похожие рецепты требуют пересчёта',
+        default=True,
+        editable=False
+    )
+    ingredients_count = models.PositiveSmallIntegerField(
+        'Количество ингредиентов',
+        default=0,
+        editable=False
+    )
+    cache_version = models.CharField(
+        'Версия кеша представления',
+        max_length=32,
+        default='',
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('favorites_count', 'in_carts_count')
+    DERIVED_FIELDS = COUNTER_FIELDS + (
+        'search_vector', 'tags_mask', 'in_timelines', 'similarity_stale',
+        'ingredients_count', 'cache_version'
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance.loaded_image = values[field_names.index('image')]
+        return instance
+
+    def image_changed(self):
+        if self._state.adding or not hasattr(self, 'loaded_image'):
+            return False
+        return (self.image.name or '') != (self.loaded_image or '')
+
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F() в recipes.signals, а поисковый
+        # вектор, маска тегов и служебные поля — в recipes.search,
+        # recipes.tags, recipes.feed, recipes.similar, recipes.pantry и
+        # api.cache, поэтому обычное сохранение не должно перезаписывать их
+        # устаревшими значениями. Варианты изображения пишет process_images,
+        # их сохранение записывает только вместе с новым изображением.
+        if not self._state.adding and not args and not kwargs.get(
+            'update_fields'
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+                and field.name != 'image_variants'
+            ]
+        # Варианты старого изображения не подходят новому, в том числе при
+        # замене изображения в админке. process_images подготовит новые.
+        if self.image_changed():
+            self.image_variants = {}
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'image' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'image_variants'}
+        super().save(*args, **kwargs)
+        self.loaded_image = self.image.name
+
     def __str__(self):
         author_name = self.author.username if self.author else "Unknown Author"
         return f"{self.name} by {author_name}"
@@ -145,12 +318,46 @@ class Tag(models.Model):
         max_length=25,
         unique=True
     )
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске тегов рецепта',
+        unique=True,
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
 
+    def clean(self):
+        if self.bit is None and Tag.free_bit() is None:
+            raise ValidationError(
+                f'Нельзя создать больше {TAG_MASK_BITS} тегов.'
+            )
+
+    def save(self, *args, **kwargs):
+        # Тег без свободного бита (созданный в обход clean) фильтруется
+        # через связь с рецептами, см. recipes.tags.filter_by_tags.
+        if self.bit is None:
+            self.bit = Tag.free_bit()
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def free_bit():
+        """Наименьший бит маски, не занятый другими тегами, или None."""
+        used = set(
+            Tag.objects.exclude(bit=None).values_list('bit', flat=True)
+        )
+        for bit in range(TAG_MASK_BITS):
+            if bit not in used:
+                return bit
+        return None
+
+    @property
+    def mask(self):
+        return 1 << self.bit
+
     def __str__(self):
         return f'{self.name} ({self.color})'
 
@@ -237,3 +444,202 @@ class FavoriteRecipe(models.Model):
 
     def __str__(self):
         return f'Избранный {self.recipe} у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается инкрементально при изменении корзины и ингредиентов
+    рецептов, см. recipes.cart.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} x {self.amount} у {self.user}'
+
+
+class ShoppingCartVersion(models.Model):
+    """Версия корзины пользователя для кеша файла списка покупок.
+
+    Хранится в базе, чтобы изменение корзины в одном процессе сбрасывало
+    кеш списка во всех остальных.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_version',
+        verbose_name='Пользователь'
+    )
+    version = models.CharField('Версия', max_length=32)
+
+    class Meta:
+        verbose_name = 'Версия корзины'
+        verbose_name_plural = 'Версии корзин'
+
+    def __str__(self):
+        return f'{self.user}: {self.version}'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписок пользователя.
+
+    Записи добавляются при публикации рецепта всем подписчикам автора,
+    см. recipes.feed.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = ['-recipe']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Заранее вычисленный похожий рецепт, см. recipes.similar."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_entries',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to_entries',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class IngredientPosting(models.Model):
+    """Рецепты с ингредиентом: отсортированный массив их id, см.
+    recipes.pantry."""
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='posting',
+        verbose_name='Ингредиент'
+    )
+    recipe_ids = models.BinaryField('Рецепты', default=bytes)
+
+    class Meta:
+        verbose_name = 'Рецепты с ингредиентом'
+        verbose_name_plural = 'Рецепты с ингредиентами'
+
+    def __str__(self):
+        return f'Рецепты с {self.ingredient}'
+
+
+class CatalogVersion(models.Model):
+    """Версия справочника тегов или ингредиентов для ETag его ответа.
+
+    Хранится в базе, чтобы изменения из любого процесса (админка,
+    imp_ing) были видны всем веб-процессам.
+    """
+    name = models.CharField('Справочник', max_length=32, primary_key=True)
+    etag = models.CharField('ETag', max_length=32)
+    modified = models.BigIntegerField('Время изменения')
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.etag}'
+
+
+class ImageUpload(models.Model):
+    """Загруженное отдельно изображение рецепта.
+
+    Токен загрузки передаётся в поле image рецепта вместо base64-строки.
+    """
+    token = models.UUIDField(
+        'Токен',
+        default=uuid.uuid4,
+        unique=True,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name='Пользователь'
+    )
+    image = models.ImageField(
+        'Изображение',
+        upload_to='static/recipe/'
+    )
+    created_at = models.DateTimeField(
+        'Дата загрузки',
+        auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return f'{self.token} от {self.user}'
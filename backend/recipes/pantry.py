@@ -0,0 +1,160 @@
+import heapq
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby
+
+from django.db import connections, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from backend.constants import PANTRY_QUERY_BATCH
+
+from .models import IngredientPosting, Recipe, RecipeIngredients
+
+# id рецептов хранятся 64-битными целыми с порядком байтов little-endian
+# независимо от платформы.
+ID_TYPECODE = 'q'
+
+
+def encode_ids(ids):
+    data = array(ID_TYPECODE, ids)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def decode_ids(data):
+    ids = array(ID_TYPECODE)
+    ids.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        ids.byteswap()
+    return ids
+
+
+def change_postings(recipe_id, added=(), removed=()):
+    """Применяет к спискам рецептов по ингредиентам добавленные и удалённые
+    ингредиенты рецепта в той же транзакции, что и запись.
+
+    Ингредиент остаётся в рецепте, пока у рецепта есть хотя бы одна
+    строка с ним. Недостающие списки создаются одним запросом, затем все
+    затронутые списки блокируются одним SELECT ... FOR UPDATE и
+    записываются одним bulk_update, поэтому число запросов не зависит от
+    числа ингредиентов рецепта.
+    """
+    changes = Counter(added)
+    changes.subtract(removed)
+    added = {pk for pk, sign in changes.items() if sign > 0}
+    removed = {pk for pk, sign in changes.items() if sign < 0}
+    if removed:
+        removed -= set(RecipeIngredients.objects.filter(
+            recipe_id=recipe_id, ingredient_id__in=removed
+        ).values_list('ingredient_id', flat=True))
+    if not added and not removed:
+        return
+    with transaction.atomic(savepoint=False):
+        # При удалении отсутствующий список не создаётся: ингредиент
+        # может удаляться вместе со своим списком.
+        if added:
+            IngredientPosting.objects.bulk_create(
+                [IngredientPosting(ingredient_id=pk) for pk in sorted(added)],
+                ignore_conflicts=True
+            )
+        postings = IngredientPosting.objects.select_for_update().filter(
+            ingredient_id__in=added | removed
+        ).order_by('pk')
+        changed = []
+        delta = 0
+        for posting in postings:
+            ids = decode_ids(posting.recipe_ids)
+            position = bisect_left(ids, recipe_id)
+            present = position < len(ids) and ids[position] == recipe_id
+            if posting.pk in added and not present:
+                ids.insert(position, recipe_id)
+                delta += 1
+            elif posting.pk in removed and present:
+                del ids[position]
+                delta -= 1
+            else:
+                continue
+            posting.recipe_ids = encode_ids(ids)
+            changed.append(posting)
+        IngredientPosting.objects.bulk_update(changed, ['recipe_ids'])
+        if delta:
+            Recipe.objects.filter(pk=recipe_id).update(
+                ingredients_count=Greatest(F('ingredients_count') + delta, 0)
+            )
+
+
+def rebuild_pantry_index(batch_size=1000):
+    """Строит списки рецептов по ингредиентам и число ингредиентов
+    рецептов заново по RecipeIngredients."""
+    rows = RecipeIngredients.objects.order_by(
+        'ingredient_id', 'recipe_id'
+    ).values_list('ingredient_id', 'recipe_id').distinct()
+    postings = (
+        IngredientPosting(
+            ingredient_id=ingredient_id,
+            recipe_ids=encode_ids(recipe_id for _, recipe_id in group)
+        )
+        for ingredient_id, group in groupby(
+            rows.iterator(), key=lambda row: row[0]
+        )
+    )
+    with transaction.atomic():
+        IngredientPosting.objects.all().delete()
+        IngredientPosting.objects.bulk_create(postings, batch_size=batch_size)
+        Recipe.objects.update(ingredients_count=Coalesce(
+            Subquery(
+                RecipeIngredients.objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    total=Count('ingredient', distinct=True)
+                ).values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        ))
+    return IngredientPosting.objects.count()
+
+
+def count_matches(ingredient_ids):
+    """{id рецепта: сколько из ingredient_ids в нём есть} по спискам."""
+    matches = Counter()
+    for data in IngredientPosting.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values_list('recipe_ids', flat=True):
+        matches.update(decode_ids(data))
+    return matches
+
+
+def rank_by_pantry(queryset, ingredient_ids, limit):
+    """Рецепты из queryset, которые можно приготовить из ingredient_ids.
+
+    Рецепты сортируются по доле имеющихся ингредиентов, затем по их
+    числу и новизне. Совпадения считаются по спискам рецептов ингредиентов
+    без группировки RecipeIngredients, из базы берутся только число
+    ингредиентов рецептов-кандидатов с учётом фильтров queryset.
+    Возвращает [(id рецепта, совпало, всего ингредиентов)].
+    """
+    matches = count_matches(ingredient_ids)
+    candidates = sorted(matches)
+    max_params = connections[queryset.db].features.max_query_params
+    batch = PANTRY_QUERY_BATCH
+    if max_params:
+        # Запас на параметры фильтров queryset.
+        batch = min(batch, max_params - 100)
+    ranked = []
+    for start in range(0, len(candidates), batch):
+        rows = queryset.filter(
+            pk__in=candidates[start:start + batch]
+        ).order_by().values_list('pk', 'ingredients_count')
+        for pk, total in rows:
+            matched = matches[pk]
+            total = max(total, matched)
+            ranked.append((matched / total, matched, pk, total))
+    return [
+        (pk, matched, total)
+        for _, matched, pk, total in heapq.nlargest(limit, ranked)
+    ]
@@ -0,0 +1,100 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import (Case, F, IntegerField, OuterRef, Q, Subquery,
+                              Value, When)
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredients
+
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX_NAME = 'recipes_recipe_search_vector_gin'
+
+
+def is_postgresql(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def build_search_vector():
+    """Вектор рецепта: название (вес A), описание (B) и названия
+    ингредиентов (C), собранные подзапросом без соединения в выборке."""
+    ingredient_names = Subquery(
+        RecipeIngredients.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('')),
+            weight='C',
+            config=SEARCH_CONFIG
+        )
+    )
+
+
+def update_search_vectors(recipe_ids=None, using='default'):
+    """Пересчитывает поисковые векторы рецептов (всех при recipe_ids=None).
+
+    На других СУБД поиск идёт без вектора, и пересчёт не нужен.
+    """
+    if not is_postgresql(using):
+        return 0
+    recipes = Recipe.objects.using(using)
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    return recipes.update(search_vector=build_search_vector())
+
+
+def schedule_search_update(recipe_ids, using='default'):
+    """Пересчитывает векторы после фиксации транзакции, когда ингредиенты
+    рецепта уже сохранены."""
+    if is_postgresql(using):
+        recipe_ids = list(recipe_ids)
+        transaction.on_commit(
+            lambda: update_search_vectors(recipe_ids, using), using=using
+        )
+
+
+def create_search_index(using='default'):
+    if is_postgresql(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} '
+                f'ON {Recipe._meta.db_table} USING gin (search_vector)'
+            )
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности.
+
+    В PostgreSQL используется индексированный поисковый вектор, в
+    остальных СУБД (тестовый SQLite) — поиск подстроки.
+    """
+    if is_postgresql(queryset.db):
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-id')
+
+    with_ingredient = RecipeIngredients.objects.filter(
+        ingredient__name__icontains=query
+    ).values('recipe_id')
+    return queryset.filter(
+        Q(name__icontains=query)
+        | Q(text__icontains=query)
+        | Q(pk__in=with_ingredient)
+    ).annotate(
+        search_rank=Case(
+            When(name__icontains=query, then=Value(3)),
+            When(text__icontains=query, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('-search_rank', '-id')
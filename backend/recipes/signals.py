@@ -0,0 +1,231 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .cart import change_cart, change_recipe_ingredients
+from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredients,
+                     ShoppingCart, SimilarRecipe, Subscribe, Tag)
+from .feed import backfill_timeline, remove_from_timeline, schedule_push
+from .pantry import change_postings
+from .search import create_search_index, schedule_search_update
+from .similar import mark_stale
+from .tags import recipes_with_bit, update_tag_masks
+
+User = get_user_model()
+
+
+def content_changed(update_fields):
+    """Сохранение меняет сам рецепт, а не только служебные поля."""
+    return not update_fields or not set(update_fields) <= {
+        'image_variants', *Recipe.COUNTER_FIELDS
+    }
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик в той же транзакции, что и запись."""
+    if pk is not None:
+        model.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def recipe_added_to_cart(sender, instance, created, **kwargs):
+    if created and instance.recipe_id:
+        change_cart(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_removed_from_cart(sender, instance, **kwargs):
+    if instance.recipe_id:
+        change_cart(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(pre_save, sender=RecipeIngredients)
+def remember_recipe_ingredient(sender, instance, **kwargs):
+    instance.previous = None
+    if instance.pk:
+        instance.previous = RecipeIngredients.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe_id', 'ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous', None)
+    if previous is not None:
+        recipe_id, ingredient_id, amount = previous
+        change_recipe_ingredients(recipe_id, {ingredient_id: -amount})
+    change_recipe_ingredients(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    change_recipe_ingredients(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_counter_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_counter_removed(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_removed(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved_for_search(sender, instance, update_fields, using,
+                            **kwargs):
+    if content_changed(update_fields):
+        schedule_search_update([instance.pk], using)
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_changed_for_search(sender, instance, using, **kwargs):
+    schedule_search_update([instance.recipe_id], using)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, using, **kwargs):
+    if not created:
+        schedule_search_update(
+            RecipeIngredients.objects.using(using).filter(
+                ingredient=instance
+            ).values_list('recipe_id', flat=True).distinct(),
+            using
+        )
+
+
+@receiver(post_migrate)
+def recipes_migrated(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        create_search_index(using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if reverse and action == 'pre_clear':
+        instance.cleared_recipe_ids = list(
+            instance.recipes.values_list('id', flat=True)
+        )
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = getattr(instance, 'cleared_recipe_ids', [])
+    else:
+        recipe_ids = list(pk_set)
+    update_tag_masks(recipe_ids)
+    mark_stale(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_tag_masks(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    if instance.bit is not None:
+        update_tag_masks(list(recipes_with_bit(instance.bit)))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        schedule_push(instance.pk)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_created_for_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_deleted_for_feed(sender, instance, **kwargs):
+    remove_from_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved_for_similar(sender, instance, created, update_fields,
+                             **kwargs):
+    if not created and content_changed(update_fields):
+        mark_stale([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_changed_for_similar(sender, instance, **kwargs):
+    mark_stale([instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted_for_similar(sender, instance, **kwargs):
+    mark_stale(SimilarRecipe.objects.filter(
+        similar=instance
+    ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def recipe_ingredient_saved_for_pantry(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous', None)
+    if previous is not None:
+        recipe_id, ingredient_id, _ = previous
+        if (recipe_id, ingredient_id) == (
+            instance.recipe_id, instance.ingredient_id
+        ):
+            return
+        change_postings(recipe_id, removed=[ingredient_id])
+    change_postings(instance.recipe_id, added=[instance.ingredient_id])
+
+
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_deleted_for_pantry(sender, instance, **kwargs):
+    change_postings(instance.recipe_id, removed=[instance.ingredient_id])
@@ -0,0 +1,223 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from backend.constants import (SIMILAR_INGREDIENT_WEIGHT, SIMILAR_MAX_POSTING,
+                               SIMILAR_RECIPES_COUNT, SIMILAR_TAG_WEIGHT)
+
+from .models import Recipe, RecipeIngredients, SimilarRecipe
+
+
+class SimilarityIndex:
+    """Разреженная матрица рецепт × ингредиент (и рецепт × тег) в памяти.
+
+    Строки матрицы хранятся множествами ингредиентов и тегов рецепта,
+    столбцы — множествами рецептов по ингредиенту. Кандидаты в похожие
+    рецепты берутся из столбцов ингредиентов рецепта, сходство — взвешенная
+    сумма косинусных мер по ингредиентам и тегам. Воркер держит индекс
+    между проходами и перечитывает только строки изменённых рецептов.
+    """
+
+    def __init__(self, recipe_ingredients=(), recipe_tags=()):
+        self.ingredients = defaultdict(set)
+        self.recipes_by_ingredient = defaultdict(set)
+        self.tags = defaultdict(set)
+        self.add(recipe_ingredients, recipe_tags)
+
+    @classmethod
+    def load(cls):
+        return cls(
+            RecipeIngredients.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(),
+            Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id'
+            ).iterator(),
+        )
+
+    def add(self, recipe_ingredients, recipe_tags):
+        for recipe_id, ingredient_id in recipe_ingredients:
+            self.ingredients[recipe_id].add(ingredient_id)
+            self.recipes_by_ingredient[ingredient_id].add(recipe_id)
+        for recipe_id, tag_id in recipe_tags:
+            self.tags[recipe_id].add(tag_id)
+
+    def discard(self, recipe_id):
+        for ingredient_id in self.ingredients.pop(recipe_id, ()):
+            recipes = self.recipes_by_ingredient[ingredient_id]
+            recipes.discard(recipe_id)
+            if not recipes:
+                del self.recipes_by_ingredient[ingredient_id]
+        self.tags.pop(recipe_id, None)
+
+    def refresh(self, recipe_ids):
+        """Перечитывает из базы строки матрицы только для recipe_ids."""
+        recipe_ids = list(recipe_ids)
+        for recipe_id in recipe_ids:
+            self.discard(recipe_id)
+        for start in range(0, len(recipe_ids), 1000):
+            batch = recipe_ids[start:start + 1000]
+            self.add(
+                RecipeIngredients.objects.filter(
+                    recipe_id__in=batch
+                ).values_list('recipe_id', 'ingredient_id'),
+                Recipe.tags.through.objects.filter(
+                    recipe_id__in=batch
+                ).values_list('recipe_id', 'tag_id'),
+            )
+
+    @staticmethod
+    def cosine(first, second):
+        if not first or not second:
+            return 0.0
+        return len(first & second) / math.sqrt(len(first) * len(second))
+
+    def score(self, first, second):
+        empty = frozenset()
+        return (
+            SIMILAR_INGREDIENT_WEIGHT * self.cosine(
+                self.ingredients.get(first, empty),
+                self.ingredients.get(second, empty)
+            )
+            + SIMILAR_TAG_WEIGHT * self.cosine(
+                self.tags.get(first, empty), self.tags.get(second, empty)
+            )
+        )
+
+    def candidates(self, recipe_id):
+        """Рецепты с общими ингредиентами. Слишком частые ингредиенты
+        (соль, вода) кандидатов не порождают, но учитываются в сходстве."""
+        found = set()
+        for ingredient_id in self.ingredients.get(recipe_id, ()):
+            recipes = self.recipes_by_ingredient[ingredient_id]
+            if len(recipes) <= SIMILAR_MAX_POSTING:
+                found |= recipes
+        found.discard(recipe_id)
+        return found
+
+    def scores(self, recipe_id):
+        return {
+            candidate: self.score(recipe_id, candidate)
+            for candidate in self.candidates(recipe_id)
+        }
+
+    def neighbours(self, recipe_id, count=SIMILAR_RECIPES_COUNT):
+        """count самых похожих рецептов: [(id, сходство)]."""
+        return heapq.nlargest(
+            count,
+            self.scores(recipe_id).items(),
+            key=lambda item: (item[1], item[0])
+        )
+
+
+def affected_recipes(index, stale_ids, count):
+    """Рецепты, чьи списки похожих могли измениться из-за stale_ids:
+    они сами, рецепты, где они уже числятся, и рецепты, куда они теперь
+    проходят по сходству. Из SimilarRecipe читаются только строки этих
+    рецептов."""
+    affected = set(stale_ids)
+    for start in range(0, len(stale_ids), 1000):
+        affected.update(SimilarRecipe.objects.filter(
+            similar_id__in=stale_ids[start:start + 1000]
+        ).values_list('recipe_id', flat=True))
+    scores = {}
+    for recipe_id in stale_ids:
+        for candidate, score in index.scores(recipe_id).items():
+            if candidate not in affected:
+                scores[candidate] = max(score, scores.get(candidate, 0.0))
+    candidates = sorted(scores)
+    bounds = {}
+    for start in range(0, len(candidates), 1000):
+        bounds.update(
+            (row['recipe'], (row['lowest'], row['total']))
+            for row in SimilarRecipe.objects.filter(
+                recipe_id__in=candidates[start:start + 1000]
+            ).values('recipe').annotate(
+                lowest=Min('score'), total=Count('id')
+            ).order_by()
+        )
+    for candidate, score in scores.items():
+        lowest, total = bounds.get(candidate, (0.0, 0))
+        if total < count or score > lowest:
+            affected.add(candidate)
+    return affected
+
+
+def write_neighbours(index, batch, count):
+    """Записывает похожие для рецептов batch. Рецепты, удалённые после
+    загрузки индекса, убираются из него, и списки считаются заново."""
+    while True:
+        neighbours = {
+            recipe_id: [
+                (similar_id, score)
+                for similar_id, score in index.neighbours(recipe_id, count)
+                if score > 0
+            ]
+            for recipe_id in batch
+        }
+        mentioned = set(batch).union(*(
+            (similar_id for similar_id, _ in items)
+            for items in neighbours.values()
+        ))
+        alive = set(Recipe.objects.filter(
+            pk__in=mentioned
+        ).values_list('pk', flat=True))
+        if mentioned <= alive:
+            break
+        for recipe_id in mentioned - alive:
+            index.discard(recipe_id)
+        batch = [recipe_id for recipe_id in batch if recipe_id in alive]
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarRecipe.objects.bulk_create(
+            (
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for recipe_id, items in neighbours.items()
+                for similar_id, score in items
+            ),
+            batch_size=5000
+        )
+
+
+def rebuild_similar(index=None, full=False, count=SIMILAR_RECIPES_COUNT):
+    """Пересчитывает похожие рецепты: все при full, иначе только для
+    изменённых рецептов и тех, на чьи списки они влияют.
+
+    Без переданного индекса (или при full) матрица читается из базы
+    целиком. С индексом предыдущего прохода перечитываются только строки
+    изменённых рецептов, так что инкрементальный проход не читает всю
+    таблицу RecipeIngredients. Признак similarity_stale снимается до
+    чтения, поэтому правки во время пересчёта попадут в следующий проход.
+
+    Возвращает (число пересчитанных рецептов, индекс).
+    """
+    stale = Recipe.objects.filter(similarity_stale=True)
+    stale_ids = sorted(stale.values_list('pk', flat=True))
+    if not full and not stale_ids:
+        return 0, index
+    Recipe.objects.filter(pk__in=stale_ids).update(similarity_stale=False)
+
+    if index is None or full:
+        index = SimilarityIndex.load()
+    else:
+        index.refresh(stale_ids)
+    if full:
+        targets = set(Recipe.objects.values_list('pk', flat=True))
+    else:
+        targets = affected_recipes(index, stale_ids, count)
+
+    targets = sorted(targets)
+    for start in range(0, len(targets), 1000):
+        write_neighbours(index, targets[start:start + 1000], count)
+    return len(targets), index
+
+
+def mark_stale(recipe_ids):
+    Recipe.objects.filter(pk__in=list(recipe_ids)).update(
+        similarity_stale=True
+    )
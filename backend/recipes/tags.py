@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Recipe, Tag
+
+
+def tags_mask(tags):
+    """Маска набора тегов: OR битов всех тегов."""
+    mask = 0
+    for tag in tags:
+        mask |= tag.mask
+    return mask
+
+
+def update_tag_masks(recipe_ids=None):
+    """Пересчитывает маски тегов рецептов (всех при recipe_ids=None)."""
+    links = Recipe.tags.through.objects.exclude(tag__bit=None)
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipe_ids = set(recipe_ids)
+        links = links.filter(recipe_id__in=recipe_ids)
+        recipes = recipes.filter(pk__in=recipe_ids)
+    masks = defaultdict(int)
+    for recipe_id, bit in links.values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    changed = [
+        Recipe(pk=pk, tags_mask=masks[pk])
+        for pk, mask in recipes.values_list('pk', 'tags_mask')
+        if mask != masks[pk]
+    ]
+    Recipe.objects.bulk_update(changed, ['tags_mask'], batch_size=1000)
+    return len(changed)
+
+
+def recipes_with_bit(bit):
+    return Recipe.objects.alias(
+        tag_hits=F('tags_mask').bitand(1 << bit)
+    ).exclude(tag_hits=0).values_list('pk', flat=True)
+
+
+def filter_by_tags(queryset, tags, match_all=False):
+    """Отбирает рецепты с любым (или, при match_all, каждым) из тегов
+    одним условием на маску, без соединения с таблицей тегов.
+
+    Индекса для условия на маску нет: рецепты просматриваются целиком,
+    но проверка маски в строке дешевле соединения с тегами и DISTINCT.
+    """
+    if any(tag.bit is None for tag in tags):
+        # Теги, созданные до появления масок, до запуска
+        # rebuild_tag_masks фильтруются по связи.
+        if match_all:
+            for tag in tags:
+                queryset = queryset.filter(tags=tag)
+            return queryset
+        return queryset.filter(tags__in=tags).distinct()
+    mask = tags_mask(tags)
+    queryset = queryset.alias(tag_hits=F('tags_mask').bitand(mask))
+    if match_all:
+        return queryset.filter(tag_hits=mask)
+    return queryset.exclude(tag_hits=0)
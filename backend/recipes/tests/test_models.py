@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+VARIANTS = {'list': {'jpeg': 'static/recipe/variants/1/list.jpeg'}}
+
+
+class RecipeSaveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = Recipe.objects.create(
+            author=User.objects.create_user(
+                email='author@example.com', username='author',
+                first_name='Author', last_name='Author', password='password'
+            ),
+            name='Каша', text='Описание', cooking_time=10,
+            image='static/recipe/test.png'
+        )
+
+    def test_stale_save_keeps_image_variants(self):
+        """Правка, загруженная до process_images, не стирает варианты."""
+        edited = Recipe.objects.get(pk=self.recipe.pk)
+        worker = Recipe.objects.get(pk=self.recipe.pk)
+        worker.image_variants = VARIANTS
+        worker.save(update_fields=['image_variants'])
+
+        edited.name = 'Овсяная каша'
+        edited.save()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Овсяная каша')
+        self.assertEqual(self.recipe.image_variants, VARIANTS)
+
+    def test_new_image_drops_variants(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_variants=VARIANTS
+        )
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.image = 'static/recipe/other.png'
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
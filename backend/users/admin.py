@@ -14,4 +14,6 @@ class UserAdmin(UserAdmin):
         'last_name',
         'id',
         'username',
+        'recipes_count',
+        'subscribers_count',
     )
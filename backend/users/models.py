@@ -14,9 +14,18 @@ class User(AbstractUser):
     last_name = models.CharField(
         'Фамилия',
         max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False)
+    subscribers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    COUNTER_FIELDS = ('recipes_count', 'subscribers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -25,3 +34,15 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F() в recipes.signals.
+        if not self._state.adding and not args and not kwargs.get(
+            'update_fields'
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)